@@ -32,4 +32,4 @@ service ssh reload
 # Update pip
 pip install -U pip
 # Install required python modules
-pip2 install -U networkx python-docx matplotlib pyftpdlib typing sphinx sphinx_rtd_theme
\ No newline at end of file
+pip2 install -U networkx python-docx matplotlib pyftpdlib pysendfile typing sphinx sphinx_rtd_theme
\ No newline at end of file
@@ -3,10 +3,82 @@ Docker Containers
 =================
 """
 
+import glob
+import hashlib
+import io
 import os
+import time
+from multiprocessing.pool import ThreadPool
+
 import docker
 from mininet.log import info, debug
 from mininet import node
+from typing import Callable, Dict, Iterable, List
+
+from utils.readiness import Probe
+from utils.session import current
+
+HASH_LABEL = 'dvni.context-hash'
+"""Image label holding the hash of the build context and base image the image was built from."""
+
+PACKAGES_LABEL = 'dvni.packages'
+"""Image label listing the packages installed in a package variant image."""
+
+
+def dockerfile_base(path):
+    # type: (str) -> str
+    """
+    Reads the image named in the 'FROM' line of a Dockerfile.
+
+    Example:
+        >>> dockerfile_base('/vagrant/container/dhcpd')
+        'dvni/base'
+
+    :param path: Directory containing the Dockerfile
+    """
+    with open(os.path.join(path, 'Dockerfile')) as f:
+        for line in f:
+            words = line.split()
+            if words and words[0].upper() == 'FROM':
+                return words[1]
+    raise Exception("Dockerfile has no FROM instruction: path = %s" % path)
+
+
+def context_hash(path, base_id=None):
+    # type: (str, str) -> str
+    """
+    Hashes every file in a build context, along with the ID of the image it's built from.
+    If any file or the base image changes, so does the hash.
+
+    :param path: Directory containing the Dockerfile
+    :param base_id: ID of the base image
+    """
+    sha = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        # Walk in a fixed order so the hash is stable
+        dirs.sort()
+        for filename in sorted(files):
+            filepath = os.path.join(root, filename)
+            sha.update(os.path.relpath(filepath, path).encode('utf-8') + b'\0')
+            with open(filepath, 'rb') as f:
+                sha.update(f.read())
+            sha.update(b'\0')
+    if base_id:
+        sha.update(base_id.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def package_tag(name, packages):
+    # type: (str, Iterable[str]) -> str
+    """
+    Names the variant of an image with a set of packages installed, the tag is a hash of the sorted package set.
+
+    Example:
+        >>> package_tag('dvni/kali', ['wireshark', 'tcpdump'])
+        'dvni/kali:pkg-88c96e87b840'
+    """
+    packages = ' '.join(sorted(set(packages)))
+    return '%s:pkg-%s' % (name, hashlib.sha256(packages.encode('utf-8')).hexdigest()[:12])
 
 
 class Docker(node.Docker):
@@ -14,18 +86,28 @@ class Docker(node.Docker):
         Wrapper to mininet.node.Docker that automates building containers. Should be used as the base class for any other docker containers.
     """
     client = docker.from_env()
-    built = []
-    added = []
 
-    def __init__(self, name, dimage, base='dvni/base', **kwargs):
+    def __init__(self, name, dimage, base='dvni/base', packages=(), **kwargs):
         self.base_image = base
+        self.packages = sorted(set(packages))  # type: List[str]
         # Prepend image names with our repo name
         dimage = 'dvni/' + dimage
         # Build the needed image if it doesn't exist
-        if dimage not in Docker.built:
+        if self.packages:
+            # Packages are installed in a derived image instead of when the container starts
+            dimage = self.build(dimage, packages=self.packages)
+        elif dimage not in current().built:
             self.build(dimage)
         super(Docker, self).__init__(name, dimage, **kwargs)
-        Docker.added.append(self)
+        current().added.append(self)
+
+    def probes(self):
+        # type: () -> List[Probe]
+        """
+        Derived classes should implement this to list the checks that show their services are ready, see `utils.readiness`.
+        By default there are none.
+        """
+        return []
 
     def document(self, doc):
         # Derived classes should implement this to write documentation about themselves
@@ -38,41 +120,214 @@ class Docker(node.Docker):
                 p.add_run('MAC: \t\t%s\n\n' % str(intf.mac))
         pass
 
-    def build(self, name):
+    @classmethod
+    def build(cls, name, progress=None, packages=(), built=None):
         """
-            Build dockerfile from the container/ directory
+            Build dockerfile from the container/ directory.
+            The image is only rebuilt if the hash of its build context or base image differs from the one
+            stored in the existing image's labels, so unchanged images are reused between processes.
 
             Example:
-                >>> self.build("kali")
-                (<Image: 'dvni/kali:latest'>, <itertools.tee object at 0x7f8c1d698098>)
+                >>> Docker.build("dvni/kali")
+                'dvni/kali'
 
             Args:
-                name (str): The directory within container/ containing the Dockerfilr
+                name (str): The image name, 'dvni/' followed by the directory within container/ containing the Dockerfile
+                progress (Callable[[str, str], None]): Called with the image name and each line of build output.
+                    Defaults to logging the output at debug level.
+                packages (List[str]): If given, a variant of the image with these APT packages installed is built,
+                    see `build_packages`.
+                built (Set[str]): Images already built or found in the cache, which aren't checked again.
+                    Defaults to those of the current session.
 
             Returns:
-                (:py:class:`Image`): The built image.
+                (str): The name of the built image.
 
         """
-        if name is not self.base_image:
-            # if base image isn't built
-            if not Docker.client.images.list(name=self.base_image):
-                # Build base image
-                self.build(self.base_image)
+        if built is None:
+            built = current().built
+        if packages:
+            return cls.build_packages(name, packages, progress, built)
 
-        print('*** Building ' + name + ' docker container\n')
         # If path to Dockerfile doesn't exist
         path = os.path.dirname(os.path.realpath(__file__)) + "/" + name[5:]
         if not os.path.isdir(path):
             # Raise exception with path for clarity
             raise Exception("Container does not exist: path = %s" % path)
 
-        image = Docker.client.images.build(path=path,
-                                           rm=True)
-        if len(image.tags) == 0:
-            image.tag(name)
-        # If the log level is debug, print the build log
-        #for line in logs:
-        #    debug(line)
-        # Add this image to the built list
-        Docker.built.append(name)
+        base = dockerfile_base(path)
+        if base.startswith('dvni/'):
+            # Our own base images are built (or found in the cache) first
+            if base not in built:
+                cls.build(base, progress, built=built)
+            base_id = Docker.client.images.get(base).id
+        else:
+            try:
+                base_id = Docker.client.images.get(base).id
+            except docker.errors.ImageNotFound:
+                # Pull it now so the hash uses the same ID next time
+                info('*** Pulling %s\n' % base)
+                base_id = Docker.client.images.pull(base).id
+
+        started = time.time()
+        digest = context_hash(path, base_id)
+        try:
+            cached = Docker.client.images.get(name).labels.get(HASH_LABEL) == digest
+        except docker.errors.ImageNotFound:
+            cached = False
+
+        if cached:
+            info('*** Image cache hit for %s (%.2fs)\n' % (name, time.time() - started))
+        else:
+            print('*** Building ' + name + ' docker container\n')
+            if progress is None:
+                # If the log level is debug, print the build log
+                progress = lambda image, line: debug('%s: %s\n' % (image, line))
+            _stream_build(name, progress, path=path, labels={HASH_LABEL: digest})
+            info('*** Image cache miss for %s, built in %.2fs\n' % (name, time.time() - started))
+        # Add this image to the built set
+        built.add(name)
         return name
+
+    @classmethod
+    def build_packages(cls, name, packages, progress=None, built=None):
+        """
+            Builds a variant of an image with extra APT packages installed, so containers start with their tools ready.
+            Variants are tagged by the sorted package set (see `package_tag`) and rebuilt only if the image they're
+            based on changes, so scenarios asking for the same packages share one image.
+
+            Example:
+                >>> Docker.build_packages("dvni/kali", ["wireshark", "tcpdump"])
+                'dvni/kali:pkg-88c96e87b840'
+
+            Args:
+                name (str): The image the variant is based on, built first if needed
+                packages (List[str]): APT packages to install
+                progress (Callable[[str, str], None]): Called with the image name and each line of build output.
+                built (Set[str]): Images already built or found in the cache, defaults to those of the current session.
+
+            Returns:
+                (str): The name of the variant image.
+        """
+        if built is None:
+            built = current().built
+        packages = sorted(set(packages))
+        tag = package_tag(name, packages)
+        if tag in built:
+            return tag
+        if name not in built:
+            cls.build(name, progress, built=built)
+
+        started = time.time()
+        digest = hashlib.sha256((Docker.client.images.get(name).id + ' '.join(packages)).encode('utf-8')).hexdigest()
+        try:
+            cached = Docker.client.images.get(tag).labels.get(HASH_LABEL) == digest
+        except docker.errors.ImageNotFound:
+            cached = False
+
+        if cached:
+            info('*** Image cache hit for %s (%s)\n' % (tag, ' '.join(packages)))
+        else:
+            print('*** Building ' + tag + ' with ' + ' '.join(packages) + '\n')
+            if progress is None:
+                progress = lambda image, line: debug('%s: %s\n' % (image, line))
+            dockerfile = '\n'.join([
+                'FROM %s' % name,
+                'RUN apt-get update && \\',
+                '    DEBIAN_FRONTEND=noninteractive apt-get install -y %s && \\' % ' '.join(packages),
+                '    rm -rf /var/lib/apt/lists/*',
+                ''])
+            _stream_build(tag, progress,
+                          fileobj=io.BytesIO(dockerfile.encode('utf-8')),
+                          labels={HASH_LABEL: digest, PACKAGES_LABEL: ' '.join(packages)})
+            info('*** Image cache miss for %s, built in %.2fs\n' % (tag, time.time() - started))
+        built.add(tag)
+        return tag
+
+
+def _stream_build(name, progress, **kwargs):
+    # type: (str, Callable[[str, str], None], **object) -> None
+    """Builds and tags an image with the low level API, which streams the build output to 'progress' as it happens."""
+    for chunk in Docker.client.api.build(tag=name, rm=True, decode=True, **kwargs):
+        if 'error' in chunk:
+            raise Exception("Failed to build %s: %s" % (name, chunk['error']))
+        if chunk.get('stream', '').strip():
+            progress(name, chunk['stream'].rstrip())
+
+
+def images():
+    # type: () -> Dict[str, str]
+    """
+    Finds every image that can be built from the container/ directory.
+
+    :return: Dictionary of image name to the image it's built from, e.g. {'dvni/dhcpd': 'dvni/base'}
+    """
+    directory = os.path.dirname(os.path.realpath(__file__))
+    return {'dvni/' + os.path.basename(os.path.dirname(path)): dockerfile_base(os.path.dirname(path))
+            for path in glob.glob(os.path.join(directory, '*', 'Dockerfile'))}
+
+
+def build_order(dependencies):
+    # type: (Dict[str, str]) -> List[List[str]]
+    """
+    Groups images into stages, where every image in a stage only depends on images from earlier stages.
+    Images within a stage can be built at the same time.
+
+    Example:
+        >>> build_order({'dvni/base': 'debian', 'dvni/dhcpd': 'dvni/base', 'dvni/kali': 'kali'})
+        [['dvni/base', 'dvni/kali'], ['dvni/dhcpd']]
+    """
+    stages = []
+    remaining = dict(dependencies)
+    while remaining:
+        # Images whose base is external or already built
+        stage = sorted(image for image, base in remaining.items() if base not in remaining)
+        if not stage:
+            raise Exception("Circular image dependency between: %s" % ', '.join(sorted(remaining)))
+        for image in stage:
+            del remaining[image]
+        stages.append(stage)
+    return stages
+
+
+def _print_progress(image, line):
+    # type: (str, str) -> None
+    """Prints a line of build output prefixed with the image name."""
+    print('[%s] %s' % (image, line))
+
+
+def prebuild(workers=4, packages=None):
+    # type: (int, Dict[str, List[List[str]]]) -> Dict[str, float]
+    """
+    Builds every image in the container/ directory ahead of time, building independent images in parallel.
+    Build output is printed as it's received, followed by the time taken and size of each image.
+
+    :param workers: Maximum number of images built at the same time.
+    :param packages: Package variants to build once the images are built, e.g. {'dvni/kali': [['nmap'], ['tcpdump']]}
+    :return: Dictionary of image name to seconds taken to build it.
+    """
+    started = time.time()
+    timings = {}
+    # Shared by the workers, as each thread has its own session
+    built = set()
+
+    def build(name, extra=()):
+        image_started = time.time()
+        name = Docker.build(name, progress=_print_progress, packages=extra, built=built)
+        timings[name] = time.time() - image_started
+
+    pool = ThreadPool(max(1, workers))
+    try:
+        for stage in build_order(images()):
+            pool.map(build, stage)
+        variants = [(name, extra) for name, sets in (packages or {}).items() for extra in sets]
+        pool.map(lambda variant: build(*variant), variants)
+    finally:
+        pool.close()
+        pool.join()
+
+    print('*** Built %d images in %.1fs' % (len(timings), time.time() - started))
+    for name in sorted(timings):
+        size = Docker.client.images.get(name).attrs['Size']
+        print('\t%s\t%.1fs\t%.0fMB' % (name.ljust(15), timings[name], size / 1e6))
+    return timings
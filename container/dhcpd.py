@@ -9,6 +9,7 @@ from io import BytesIO
 from ipaddress import IPv4Network, IPv4Address
 
 from container import Docker
+from utils.readiness import process_alive, udp_bind
 
 
 class Dhcpd(Docker):
@@ -66,6 +67,10 @@ class Dhcpd(Docker):
 
         self.dhcp_pid = self.cmd("/usr/sbin/dhcpd  --no-pid %s" % ' '.join(str(intf.name) for idx, intf in self.intfs.items()))
 
+    def probes(self):
+        """Extends Docker.probes. The server is ready once it's bound to the DHCP server port."""
+        return [process_alive('dhcpd'), udp_bind(67)]
+
     def add_global(self, option):
         # type: (str) -> None
         """
@@ -3,11 +3,17 @@ Kali Linux
 ==========
 """
 
+import time
+
 from mininet.log import info
-from typing import List, Any
+from typing import Dict, List, Any
 
-from container import Docker
+from container import Docker, package_tag
+from container.pool import Pool, PooledClient
+from utils.readiness import tcp_listen
+from utils.tenant import PortAllocator
 from utils.document import add_hyperlink
+from utils.dryrun import DryNode
 
 # TODO: Discuss and fix issues with network card ordering:
 # https://unix.stackexchange.com/questions/10254/how-to-change-the-order-of-the-network-cards-eth1-eth0-on-linux
@@ -15,20 +21,63 @@ from utils.document import add_hyperlink
 VNC_DEFAULT = 5900
 WEB_DEFAULT = 6080
 
+vnc_ports = PortAllocator('vnc', VNC_DEFAULT)
+"""Host ports for VNC, each Kali host that isn't given one is allocated its own so scenarios can run side by side."""
+web_ports = PortAllocator('web', WEB_DEFAULT)
+"""Host ports for the NoVNC web server."""
+
+POOL_READY = 'grep -qi ":%04X " /proc/net/tcp' % WEB_DEFAULT
+"""Succeeds once the NoVNC web server is listening, the last service started by /init."""
+
+# Patterns are bracketed so they don't match, and kill, the shell running them.
+# The node's own shell is still running when Containernet removes its container, and is killed outright so it doesn't
+# write its history on the way out.
+POOL_RESET = ('pkill -KILL -f "^bash .*-is [m]ininet:" ; '
+              'pkill -f "[n]map|[e]ttercap|[a]rpspoof|[m]acof|[d]hcpstarv|[t]cpdump|[w]ireshark" ; '
+              'for i in $(ls /sys/class/net) ; do [ "$i" = lo ] || [ "$i" = eth0 ] || ip link delete "$i" ; done ; '
+              'ip neigh flush all ; rm -rf /tmp/* ; true')
+"""
+Stops the node's shell and attack tools, and removes the scenario's interfaces from a used Kali container.
+The container only goes back in the pool if this leaves no new files or processes, see `Pool.release`.
+"""
+
+
+def kali_pool(size=2, resolution="1920x1080x24", packages=()):
+    # type: (int, str, List[str]) -> Pool
+    """
+    Creates a pool of started Kali containers. Set it as `Kali.pool` for new Kali hosts to use it.
+    Only Kali hosts asking for the same packages are given a container from the pool.
+
+    Example:
+        >>> Kali.pool = kali_pool(2)
+        >>> Kali.pool.fill(wait=True)
+    """
+    return Pool(Docker.build('dvni/kali', packages=packages), size,
+                command='/init',
+                environment={'RESOLUTION': resolution},
+                ports=[VNC_DEFAULT, WEB_DEFAULT],
+                ready=POOL_READY,
+                reset=POOL_RESET)
+
 
 class Kali(Docker):
     # Static varible for ports.
     # Avoids using these numbers elsewhere in code where it may become confusing.
 
-    def __init__(self, name, resolution="1920x1080x24", vnc=VNC_DEFAULT, web=WEB_DEFAULT, **kwargs):
+    pool = None  # type: Pool
+    """Pool of started containers to take from instead of starting a new one, see `kali_pool`."""
+
+    def __init__(self, name, resolution="1920x1080x24", vnc=None, web=None, packages=(), **kwargs):
         """
         Creates a Kali host running a VNC server and NoVNC web server
 
         :param resolution: (Optional) String in the format WidthxHeightxColorDepth for the remote display.
         :type resolution: string
-        :param vnc: Port to bind VNC to on the host.
+        :param packages: (Optional) APT packages the scenario needs, the host uses an image with them already installed.
+        :type packages: [string]
+        :param vnc: (Optional) Port to bind VNC to on the host, the first free port from VNC_DEFAULT by default.
         :type vnc: int
-        :param web: Port to bind NoVNC web server to on the host.
+        :param web: (Optional) Port to bind NoVNC web server to on the host, the first free port from WEB_DEFAULT by default.
         :type web: int
 
         Attributes:
@@ -45,6 +94,26 @@ class Kali(Docker):
         # Set resolution in environment settings from parameter if not set
         if 'RESOLUTION' not in kwargs['environment']:
             kwargs['environment']['RESOLUTION'] = resolution
+
+        self.pooled = None
+        if isinstance(self, DryNode):
+            # Nothing is started in a dry run, so no container is claimed or port leased.
+            # The defaults are what a single scenario gets, and keep sheets the same for the same seed.
+            vnc = vnc or VNC_DEFAULT
+            web = web or WEB_DEFAULT
+        # Only containers started with the same settings can be used
+        elif Kali.pool is not None and Kali.pool.environment == kwargs['environment'] and \
+                Kali.pool.image == (package_tag('dvni/kali', packages) if packages else 'dvni/kali'):
+            self.pooled = Kali.pool.claim(name)
+        if self.pooled is not None:
+            # Docker chose the published ports when the pooled container was started
+            ports = self.pooled.attrs['NetworkSettings']['Ports']
+            vnc = int(ports['%d/tcp' % VNC_DEFAULT][0]['HostPort'])
+            web = int(ports['%d/tcp' % WEB_DEFAULT][0]['HostPort'])
+        if vnc is None:
+            vnc = vnc_ports.allocate()
+        if web is None:
+            web = web_ports.allocate()
         Docker.__init__(self,
                         name,
                         dimage="kali",
@@ -52,22 +121,47 @@ class Kali(Docker):
                         ports=[VNC_DEFAULT, WEB_DEFAULT],
                         port_bindings={VNC_DEFAULT: vnc, WEB_DEFAULT: web},
                         publish_all_ports=True,
+                        packages=packages,
                         **kwargs)
+        if self.pooled is not None and not isinstance(getattr(self, '_dcli', None), PooledClient):
+            self.pooled.remove(force=True, v=True)
+            raise Exception("Containernet didn't create its docker client as 'dcli', so pooled containers can't be "
+                            "adopted. Run without a Kali pool.")
+
+    # Pooled containers are adopted by overriding Containernet's docker client attribute, as Containernet has no
+    # public way to give a node an existing container. This relies on mininet.node.Docker of the Containernet in the
+    # KcY/containernet box (Containernet 2.x, Python 2): __init__ assigns 'self.dcli = docker.APIClient(...)' and
+    # uses it for create_container and start, and terminate uses it for remove_container.
+    # __init__ checks the client was adopted, so a Containernet that changes this fails loudly.
+    @property
+    def dcli(self):
+        return self._dcli
+
+    @dcli.setter
+    def dcli(self, client):
+        self._dcli = PooledClient(client, Kali.pool, self.pooled) if self.pooled is not None else client
 
     def config(self, **kwargs):
         """ Extends Node.config. Installed packages added before the container was started, and marks the container as started."""
         super(Kali, self).config(**kwargs)
         # Install collected packages
         self.started = True
-        self.install_package(self.packages_to_install)
+        self.install_package(*self.packages_to_install)
+
+    def probes(self):
+        """Extends Docker.probes. Kali is ready once students can connect with VNC or the web page."""
+        return [tcp_listen(VNC_DEFAULT), tcp_listen(WEB_DEFAULT)]
 
     def install_package(self, *packages):
         """
         Installs packages inside the container with APT. Stores the packages for if the container is not yet started.
+        Packages should be passed to the constructor instead where possible, so they're installed in the image.
 
         :param packages:
         :type packages: [string]
         """
+        # Skip packages already installed in the image
+        packages = [p for p in packages if p not in self.packages]
         # If the host isn't started, add packages to a list for later
         if not self.started:
             self.packages_to_install += packages
@@ -75,7 +169,7 @@ class Kali(Docker):
             if len(packages) == 0:
                 return
             info("*** Installing Kali packages\n")
-            self.cmd("apt install -y", " ".join(*packages))
+            self.cmd("apt install -y", " ".join(packages))
 
     def add_hint(self, doc):
         """
@@ -94,6 +188,63 @@ class Kali(Docker):
             'NOTE: Many tools will use the default interface of eth0, the network for tasks is %s' % self.defaultIntf()).bold = True
 
 
+def _start(image, timeout=300):
+    # type: (str, int) -> Any
+    """Starts a Kali container outside of Mininet and waits for it to be ready, returning the container."""
+    container = Docker.client.containers.run(image, command='/init', privileged=True, tty=True, detach=True,
+                                             environment={'RESOLUTION': '1920x1080x24'})
+    started = time.time()
+    while container.exec_run(['sh', '-c', POOL_READY])[0] != 0:
+        if time.time() - started > timeout:
+            container.remove(force=True)
+            raise Exception("Kali container wasn't ready after %ds: image = %s" % (timeout, image))
+        time.sleep(0.5)
+    return container
+
+
+def package_report(packages):
+    # type: (List[str]) -> Dict[str, float]
+    """
+    Compares starting Kali from an image with the packages installed against installing them when the container starts.
+
+    Example:
+        >>> package_report(['wireshark', 'tcpdump', 'ftp'])
+        *** wireshark tcpdump ftp
+        	runtime install:	48.2s to ready	2210MB image
+        	package image:	6.1s to ready	2390MB image (built in 51.7s)
+
+    :param packages: APT packages to install
+    :return: Seconds to ready and image sizes in bytes for each approach, and the time taken to build the package image.
+    """
+    report = {}
+    base = Docker.build('dvni/kali')
+
+    # Runtime install, as happens when packages are added with install_package
+    started = time.time()
+    container = _start(base)
+    try:
+        container.exec_run(['sh', '-c', 'apt-get update && DEBIAN_FRONTEND=noninteractive apt-get install -y ' +
+                            ' '.join(packages)])
+        report['runtime_ready'] = time.time() - started
+    finally:
+        container.remove(force=True)
+    report['runtime_size'] = Docker.client.images.get(base).attrs['Size']
+
+    started = time.time()
+    variant = Docker.build(base, packages=packages)
+    report['build'] = time.time() - started
+    started = time.time()
+    _start(variant).remove(force=True)
+    report['package_ready'] = time.time() - started
+    report['package_size'] = Docker.client.images.get(variant).attrs['Size']
+
+    print('*** %s' % ' '.join(packages))
+    print('\truntime install:\t%.1fs to ready\t%.0fMB image' % (report['runtime_ready'], report['runtime_size'] / 1e6))
+    print('\tpackage image:\t%.1fs to ready\t%.0fMB image (built in %.1fs)' % (
+        report['package_ready'], report['package_size'] / 1e6, report['build']))
+    return report
+
+
 def example():
     from mininet.log import setLogLevel
     from mininet.clean import cleanup
@@ -111,10 +262,9 @@ def example():
                          resolution="1920x1080x24",  # OPTIONAL
                          port_vnc=5900,  # OPTIONAL
                          port_web=6080,  # OPTIONAL
+                         packages=["iproute2", "dnmap"],  # OPTIONAL
                          ip='10.10.10.1/24')
 
-    kali.install_package("iproute2", "dnmap")
-
     h1 = net.addHost('h1',
                      ip='10.10.10.2/24')
     s1 = net.addSwitch('s1')
@@ -124,7 +274,7 @@ def example():
 
     net.start()
 
-    kali.install_package(["nmap"])
+    kali.install_package("nmap")
 
     CLI(net)
     net.stop()
@@ -0,0 +1,234 @@
+"""
+Warm Container Pool
+===================
+
+Keeps containers started and idle so a scenario can claim one that has already booted.
+Pool containers are plain docker containers named 'dvni-pool.[image].[n]', their state lives in docker
+so every process on the VM shares the same pool.
+When claimed, a container is renamed to the name Containernet gives its nodes ('mn.[node]') and adopted by the node.
+When the node is removed the container is reset, and only renamed back into the pool if it's back to the state it was
+claimed in: no files changed and no processes started since. Anything a student could leave for the next, such as
+captures or shell history, means the container is removed instead.
+"""
+
+import time
+import uuid
+
+import docker
+from mininet.log import info, debug, warn
+from typing import Dict, List, Optional, Set, Tuple
+
+from container import Docker
+from utils.session import current
+
+POOL_LABEL = 'dvni.pool'
+"""Label given to pool containers, holds the image the pool is for."""
+
+
+class Pool(object):
+
+    def __init__(self, image, size=2, command=None, environment=None, ports=None, ready='true', reset='true',
+                 timeout=180):
+        # type: (str, int, str, Dict[str, str], List[int], str, str, int) -> None
+        """
+        A pool of started containers for a single image.
+
+        :param image: Image to start, e.g. 'dvni/kali'
+        :param size: Number of idle containers to keep started
+        :param command: Command run by the containers
+        :param environment: Environment variables for the containers
+        :param ports: Container ports to publish, docker chooses the host ports
+        :param ready: Shell command run in a container that succeeds once it has finished booting
+        :param reset: Shell command run in a container when it's returned to the pool
+        :param timeout: Seconds to wait for a container to become ready when filling the pool
+        """
+        self.image = image
+        self.size = size
+        self.command = command
+        self.environment = environment or {}
+        self.ports = ports or []
+        self.ready_command = ready
+        self.reset_command = reset
+        self.timeout = timeout
+        self.claims = 0
+        """Number of times a container was requested from the pool."""
+        self.hits = 0
+        """Number of requests that got a ready container."""
+        self.ready_times = []  # type: List[float]
+        """Seconds taken for each container started by `fill` to become ready."""
+        self.claimed = {}  # type: Dict[str, Tuple[Set[str], Set[str]]]
+        """Changed paths and running processes of each container claimed by this process, when it was claimed."""
+
+    @property
+    def prefix(self):
+        # type: () -> str
+        """Name prefix of this pool's idle containers."""
+        return 'dvni-pool.%s.' % self.image.replace('/', '-')
+
+    def idle(self):
+        # type: () -> List[docker.models.containers.Container]
+        """Lists the running containers waiting in the pool, oldest first."""
+        containers = Docker.client.containers.list(filters={'label': '%s=%s' % (POOL_LABEL, self.image)})
+        idle = [c for c in containers if c.name.startswith(self.prefix)]
+        return sorted(idle, key=lambda c: c.attrs['Created'])
+
+    def is_ready(self, container):
+        # type: (docker.models.containers.Container) -> bool
+        """Runs the ready command inside the container."""
+        return container.exec_run(['sh', '-c', self.ready_command])[0] == 0
+
+    @staticmethod
+    def state(container):
+        # type: (docker.models.containers.Container) -> Tuple[Set[str], Set[str]]
+        """
+        Paths changed from the container's image and the command lines of its processes,
+        compared on release to decide if the container can go back in the pool.
+        """
+        changed = set(change['Path'] for change in container.diff() or [])
+        output = container.exec_run(['ps', '-eo', 'stat=,args='])[1].decode('utf-8', 'replace')
+        processes = set()
+        for line in output.splitlines():
+            fields = line.split(None, 1)
+            # Leaving out the ps listing them, and processes killed by the reset that haven't been reaped yet
+            if len(fields) == 2 and not fields[0].startswith('Z') and fields[1].split()[0] != 'ps':
+                processes.add(fields[1].strip())
+        return changed, processes
+
+    def fill(self, wait=False):
+        # type: (bool) -> int
+        """
+        Starts containers until the pool has 'size' idle containers.
+
+        :param wait: Wait for the new containers to become ready, recording how long each takes.
+        :return: Number of containers started.
+        """
+        if self.image not in current().built:
+            Docker.build(self.image)
+        started = []
+        for _ in range(self.size - len(self.idle())):
+            started.append(Docker.client.containers.run(self.image,
+                                                        command=self.command,
+                                                        name=self.prefix + uuid.uuid4().hex[:8],
+                                                        labels={POOL_LABEL: self.image},
+                                                        environment=self.environment,
+                                                        ports={port: None for port in self.ports},
+                                                        privileged=True,
+                                                        tty=True,
+                                                        stdin_open=True,
+                                                        detach=True))
+        if wait:
+            began = time.time()
+            waiting = list(started)
+            while waiting and time.time() - began < self.timeout:
+                for container in [c for c in waiting if self.is_ready(c)]:
+                    self.ready_times.append(time.time() - began)
+                    waiting.remove(container)
+                time.sleep(1)
+            if waiting:
+                warn('*** %d pool containers for %s weren\'t ready after %ds\n' % (len(waiting), self.image, self.timeout))
+        return len(started)
+
+    def claim(self, name):
+        # type: (str) -> Optional[docker.models.containers.Container]
+        """
+        Takes a ready container from the pool and renames it to Containernet's name for the node.
+
+        :param name: Mininet node name, the container becomes 'mn.[name]'
+        :return: The claimed container, or None if no container was ready.
+        """
+        started = time.time()
+        self.claims += 1
+        for container in self.idle():
+            if not self.is_ready(container):
+                continue
+            try:
+                # Renaming is atomic, if another process claims the container first this fails
+                container.rename('mn.%s' % name)
+            except docker.errors.APIError:
+                continue
+            container.reload()
+            self.claimed[container.id] = self.state(container)
+            self.hits += 1
+            info('*** Claimed pooled %s container for %s in %.2fs (hit rate %.0f%%)\n' % (
+                self.image, name, time.time() - started, self.hit_rate * 100))
+            # Replace the claimed container, it boots in the background
+            self.fill()
+            return container
+        info('*** No pooled %s container ready for %s (hit rate %.0f%%)\n' % (self.image, name, self.hit_rate * 100))
+        return None
+
+    def release(self, container_id):
+        # type: (str) -> None
+        """
+        Resets a claimed container and returns it to the pool.
+        Containers that aren't needed to fill the pool, can't be reset, or have files or processes the reset didn't
+        remove, are removed.
+        """
+        container = Docker.client.containers.get(container_id)
+        claimed = self.claimed.pop(container_id, None)
+        if len(self.idle()) < self.size and claimed is not None and \
+                container.exec_run(['sh', '-c', self.reset_command])[0] == 0:
+            changed, processes = self.state(container)
+            if changed <= claimed[0] and processes <= claimed[1]:
+                container.rename(self.prefix + uuid.uuid4().hex[:8])
+                debug('*** Returned %s to the %s pool\n' % (container_id[:12], self.image))
+                return
+            debug('*** Removing %s, the reset left %s\n' % (
+                container_id[:12], ', '.join(sorted((changed - claimed[0]) | (processes - claimed[1])))))
+        container.remove(force=True, v=True)
+
+    @property
+    def hit_rate(self):
+        # type: () -> float
+        return float(self.hits) / self.claims if self.claims else 0.0
+
+    def stats(self):
+        # type: () -> Dict[str, float]
+        """Returns the pool's size, idle count, claims, hit rate and average time for a container to become ready."""
+        return {'image': self.image,
+                'size': self.size,
+                'idle': len(self.idle()),
+                'claims': self.claims,
+                'hits': self.hits,
+                'hit_rate': self.hit_rate,
+                'ready_time': sum(self.ready_times) / len(self.ready_times) if self.ready_times else None}
+
+
+class PooledClient(object):
+
+    def __init__(self, client, pool, container):
+        """
+        Wraps Containernet's docker API client so a node adopts a pooled container instead of creating one.
+
+        :param client: docker.APIClient created by Containernet
+        :param pool: The pool the container was claimed from
+        :param container: The claimed container
+        """
+        self._client = client
+        self.pool = pool
+        self.container = container
+        self.released = False
+        """If the container has been returned to the pool, after which it may belong to another node."""
+
+    def __getattr__(self, item):
+        return getattr(self._client, item)
+
+    def create_container(self, *args, **kwargs):
+        # The container already exists and has been renamed to the node's name
+        return {'Id': self.container.id, 'Warnings': None}
+
+    def start(self, container, *args, **kwargs):
+        if self._id(container) != self.container.id:
+            return self._client.start(container, *args, **kwargs)
+
+    def remove_container(self, container, *args, **kwargs):
+        if self._id(container) != self.container.id:
+            return self._client.remove_container(container, *args, **kwargs)
+        # Only released once, a second release would reset the container under whichever node claimed it next
+        if not self.released:
+            self.released = True
+            self.pool.release(self.container.id)
+
+    @staticmethod
+    def _id(container):
+        return container.get('Id') if isinstance(container, dict) else container
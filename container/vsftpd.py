@@ -10,6 +10,7 @@ from mininet.node import Controller
 
 from container import Docker
 from utils.account import add_user
+from utils.readiness import process_alive, tcp_listen
 
 
 class Vsftpd(Docker):
@@ -25,6 +26,10 @@ class Vsftpd(Docker):
         super(Vsftpd, self).config(**kwargs)
         self.cmd("vsftpd &")
 
+    def probes(self):
+        """Extends Docker.probes. The daemon is ready once it's listening on the FTP port."""
+        return [process_alive('vsftpd'), tcp_listen(21)]
+
 
 def example():
     setLogLevel('debug')
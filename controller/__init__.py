@@ -7,7 +7,17 @@ import os
 from shutil import copyfile
 
 from mininet.node import Controller
-from typing import Dict
+from typing import Any, Dict, List
+
+METRICS_DIRECTORY = '/tmp/dvni'
+"""Where cam_learning writes its metrics and MAC table snapshots."""
+
+
+def cam_learning_files(name):
+    # type: (str) -> List[str]
+    """The metrics and MAC table snapshot files cam_learning writes when launched with the given name."""
+    prefix = os.path.join(METRICS_DIRECTORY, name)
+    return [prefix + suffix for suffix in ('.prom', '.prom.tmp', '.table.json', '.table.json.tmp')]
 
 
 class PoxController(Controller):
@@ -18,14 +28,15 @@ class PoxController(Controller):
     pox_comand = pox_directory + '/pox.py'
     """The location of 'pox.py'"""
 
-    def __init__(self, name, script, verbose=False, **kwargs):
-        # type: (str, str, bool, Dict) -> None
+    def __init__(self, name, script, verbose=False, options=None, **kwargs):
+        # type: (str, str, bool, Dict[str, Any], Dict) -> None
         """
         POX OpenFlow controller implementation for Mininet. Allows scripts within this folder to act as a controller for OpenFlow based switches.
 
         :param name: Controller name for Mininet
         :param script: Filename of the script to
         :param verbose: Passes '--verbose' flag to pox.py
+        :param options: Passed to the script's launch function, e.g. {'table_size': 100}
         """
 
         PoxController.copyScript(script)
@@ -33,7 +44,8 @@ class PoxController(Controller):
                             command=PoxController.pox_comand,
                             cargs=('--verbose ' if verbose else '') +
                             'openflow.of_01 --port=%d ' +
-                            'dvni.' + script,
+                            'dvni.' + script +
+                            ''.join(' --%s=%s' % option for option in sorted((options or {}).items())),
                             cdir=PoxController.pox_directory,
                             **kwargs)
 
@@ -0,0 +1,223 @@
+"""
+Replays synthetic packet-ins through cam_learning's LearningSwitch, without
+OVS or Mininet, to catch controller regressions cheaply.
+
+The switch is given a fake connection that records what it would have sent,
+and packet-ins are raised on it as POX's own PacketIn events, so they take
+the same path they would from a real switch.  Traffic patterns:
+
+normal     Unicast between a small set of hosts, mostly to known MACs
+broadcast  A broadcast storm from the same hosts
+macof      Random source and destination MACs, as macof sends
+
+Each pattern is run in each forwarding mode, and with the switch parsing whole
+packets (full) or reading just their Ethernet header (header), reporting
+packets/sec, handling time percentiles and the growth of the process's memory.
+
+Run from the VM with POX installed:
+
+    python controller/cam_benchmark.py --count 100000
+
+The POX version and directory are printed first, so recorded results can be
+traced to the POX they were measured against.  Only results from a real POX
+install mean anything, as POX's packet library is most of the cost being
+measured.  cam_learning's fast_path, the header parser, stays off by default
+until the full and header rows of such a run are recorded here.
+"""
+
+import argparse
+import array
+import gc
+import os
+import random
+import sys
+import time
+
+PATTERNS = ('normal', 'broadcast', 'macof')
+
+PARSERS = ('full', 'header')
+
+BROADCAST = 'ff:ff:ff:ff:ff:ff'
+
+
+def _rss():
+    """ Returns the resident memory of this process in bytes """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _mac(rng):
+    """ Returns a random unicast MAC """
+    octets = [rng.randint(0, 255) for _ in range(6)]
+    octets[0] &= 0xfe
+    return ':'.join('%02x' % octet for octet in octets)
+
+
+def frames(pattern, count, hosts=20, seed=0):
+    """
+    Returns (in port, ethernet frame) for each packet of a traffic pattern.
+
+    :param pattern: One of PATTERNS
+    :param count: Number of packets
+    :param hosts: Number of hosts sending normal and broadcast traffic, each on its own port.
+        macof traffic comes from the port after them.
+    :param seed: Random seed, the same seed gives the same packets
+    """
+    from pox.lib.addresses import EthAddr, IPAddr
+    from pox.lib.packet.ethernet import ethernet
+    from pox.lib.packet.ipv4 import ipv4
+    from pox.lib.packet.udp import udp
+
+    rng = random.Random(seed)
+    macs = [_mac(rng) for _ in range(hosts)]
+
+    def frame(src, dst, ip):
+        datagram = udp(srcport=rng.randint(1024, 65535), dstport=53)
+        datagram.payload = b'\0' * 18
+        packet = ipv4(srcip=IPAddr('10.0.0.%d' % ip), dstip=IPAddr('10.0.0.%d' % rng.randint(1, 254)),
+                      protocol=ipv4.UDP_PROTOCOL)
+        packet.payload = datagram
+        eth = ethernet(src=EthAddr(src), dst=EthAddr(dst), type=ethernet.IP_TYPE)
+        eth.payload = packet
+        return eth.pack()
+
+    packets = []
+    for _ in range(count):
+        if pattern == 'macof':
+            packets.append((hosts + 1, frame(_mac(rng), _mac(rng), rng.randint(1, 254))))
+            continue
+        host = rng.randrange(hosts)
+        dst = BROADCAST if pattern == 'broadcast' else macs[rng.randrange(hosts)]
+        packets.append((host + 1, frame(macs[host], dst, host + 1)))
+    return packets
+
+
+def run(pattern, mode, count, table_size=100, seed=0, parser='header'):
+    """
+    Replays a traffic pattern through a new LearningSwitch.
+
+    :return: A dict of the results
+    """
+    import pox.openflow.libopenflow_01 as of
+    from pox.lib.revent import EventMixin
+    from pox.openflow import PacketIn
+    import cam_learning
+
+    class Connection(EventMixin):
+        """ Stands in for a switch's connection, counting what is sent to it """
+        _eventMixin_events = set([PacketIn])
+
+        def __init__(self):
+            self.dpid = 1
+            # Long enough ago that the switch floods
+            self.connect_time = 0
+            self.sends = 0
+            self.sent = 0
+
+        def send(self, data):
+            if not isinstance(data, bytes):
+                data = data.pack()
+            self.sends += 1
+            self.sent += len(data)
+
+    packets = frames(pattern, count, seed=seed)
+    connection = Connection()
+    table = cam_learning.CamTable(table_size, 300, 1)
+    switch = cam_learning.LearningSwitch(connection, False, table, mode, fast_path=parser == 'header')
+    # Built before timing, so timing and memory only cover handling them.
+    # The events are made as they're raised, as POX does, so their parsed packets don't add to the memory.
+    messages = [of.ofp_packet_in(buffer_id=i, in_port=port, reason=of.OFPR_NO_MATCH, data=data)
+                for i, (port, data) in enumerate(packets)]
+    # Stored unboxed, so recording them doesn't add to the memory either
+    latencies = array.array('d', [0.0]) * count
+    gc.collect()
+    rss = _rss()
+    started = time.time()
+    for i, message in enumerate(messages):
+        before = time.time()
+        connection.raiseEvent(PacketIn(connection, message))
+        latencies[i] = time.time() - before
+    elapsed = time.time() - started
+    growth = _rss() - rss
+    latencies = sorted(latencies)
+    return {'pattern': pattern,
+            'mode': mode,
+            'parser': parser,
+            'packets': count,
+            'pps': count / elapsed,
+            'p50': _percentile(latencies, 0.5),
+            'p90': _percentile(latencies, 0.9),
+            'p99': _percentile(latencies, 0.99),
+            'max': latencies[-1],
+            'memory': growth,
+            'table': len(table),
+            'sends': connection.sends,
+            'sent': connection.sent,
+            'counters': dict(switch.counters)}
+
+
+def benchmark(count=20000, patterns=PATTERNS, modes=None, table_size=100, seed=0, parsers=PARSERS):
+    """
+    Runs each pattern in each mode with each parser and prints a line of results for each.
+    With both parsers, the header parser's speedup over the full one is printed after it.
+
+    Example:
+        >>> benchmark(20000)
+        pattern    mode       parser       pps    p50us    p90us    p99us    maxus   memKB  table   sends
+        normal     packet_out full       ...
+    """
+    import cam_learning
+    results = []
+    print('%-10s %-10s %-6s %9s %8s %8s %8s %8s %7s %6s %7s' %
+          ('pattern', 'mode', 'parser', 'pps', 'p50us', 'p90us', 'p99us', 'maxus', 'memKB', 'table', 'sends'))
+    for pattern in patterns:
+        for mode in modes or cam_learning.MODES:
+            pps = {}
+            for parser in parsers:
+                result = run(pattern, mode, count, table_size, seed, parser)
+                results.append(result)
+                pps[parser] = result['pps']
+                print('%-10s %-10s %-6s %9.0f %8.1f %8.1f %8.1f %8.1f %7d %6d %7d%s' % (
+                    pattern, mode, parser, result['pps'],
+                    result['p50'] * 1e6, result['p90'] * 1e6, result['p99'] * 1e6, result['max'] * 1e6,
+                    result['memory'] // 1024, result['table'], result['sends'],
+                    '  %.2fx' % (pps['header'] / pps['full']) if len(pps) == 2 and parser == 'header' else ''))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays synthetic packet-ins through cam_learning.')
+    parser.add_argument('--count', type=int, default=20000, help='Packets per run.')
+    parser.add_argument('--pattern', action='append', choices=PATTERNS,
+                        help='Traffic pattern to run, may be repeated. Defaults to all.')
+    parser.add_argument('--mode', action='append', help='Forwarding mode to run, may be repeated. Defaults to all.')
+    parser.add_argument('--parser', action='append', choices=PARSERS,
+                        help='How the switch reads packets, may be repeated. Defaults to both, to compare them.')
+    parser.add_argument('--table-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--pox', default='/var/pox', help='POX installation directory.')
+    args = parser.parse_args()
+
+    if not os.path.isfile(os.path.join(args.pox, 'pox.py')):
+        parser.error('%s is not a POX installation, it has no pox.py' % args.pox)
+    sys.path.insert(0, args.pox)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # POX's core is created by pox.py at boot, cam_learning needs it when imported
+    import pox.core
+    print('%s from %s, Python %s' % (getattr(pox.core, 'version_string', 'POX (unknown version)'),
+                                     os.path.abspath(args.pox), sys.version.split()[0]))
+    if pox.core.core is None:
+        pox.core.initialize()
+    import logging
+    # Keep per-packet log lines out of the timings
+    logging.getLogger().setLevel(logging.ERROR)
+
+    benchmark(args.count, args.pattern or PATTERNS, args.mode, args.table_size, args.seed, args.parser or PARSERS)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,15 +25,203 @@ import pox.openflow.libopenflow_01 as of
 from pox.lib.revent import *
 from pox.lib.util import dpidToStr
 from pox.lib.util import str_to_bool
-from collections import deque
+from pox.lib.recoco import Timer
+from pox.lib.addresses import EthAddr
+from pox.lib.packet.ethernet import ethernet
+from collections import OrderedDict
+import bisect
+import json
+import logging
+import math
+import os
+import signal
+import struct
 import time
 
 log = core.getLogger()
 
 # We don't want to flood immediately when a switch connects.
 FLOOD_DELAY = 5
-# Limit max MAC address table size to be 1000
-MAX_TABLE_SIZE = 100
+
+# How known destinations are forwarded:
+# packet_out sends every packet out from the controller, flow installs a
+# flow on the switch so the rest of the traffic never reaches it.
+MODES = ('packet_out', 'flow')
+
+# Counters kept by each switch, with their help text for the metrics file.
+COUNTERS = (
+    ('packet_ins', 'Packet-ins received from the switch'),
+    ('learned', 'MACs added to the table'),
+    ('moved', 'MACs seen on a different port to the one in the table'),
+    ('evicted', 'MACs removed to make room in a full table'),
+    ('aged', 'MACs removed after not being seen for the idle timeout'),
+    ('flooded', 'Packets flooded'),
+    ('dropped', 'Packets dropped'),
+    ('forwarded', 'Packets to known destinations sent out by the controller'),
+    ('flows_installed', 'Flows installed for known destinations'),
+    ('flows_deleted', 'Flow deletes sent for MACs that left the table'),
+)
+
+# Ethertypes of VLAN tags (802.1Q, 802.1ad and the older QinQ), each
+# followed by the tag's ethertype or the next tag.
+VLAN_TYPES = (0x8100, 0x88a8, 0x9100)
+
+# Destinations switches mustn't forward, 01:80:c2:00:00:00 to 0f.
+BRIDGE_FILTERED = b'\x01\x80\xc2\x00\x00'
+
+# Upper bounds, in seconds, of the packet-in handling time histogram.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+
+def parse_header(data):
+    """
+    Reads the destination MAC, source MAC and ethertype from the start of a
+    frame, which is all the switch needs to learn and forward.  The MACs are
+    the raw 6 bytes, and the ethertype is that after any VLAN tags.
+
+    Much cheaper than event.parse(), which decodes every layer of the packet.
+
+    Returns None if the frame is too short to have an Ethernet header
+    """
+    if data is None or len(data) < 14:
+        return None
+    dst, src, ethertype = struct.unpack_from('!6s6sH', data)
+    offset = 14
+    while ethertype in VLAN_TYPES and len(data) >= offset + 4:
+        ethertype = struct.unpack_from('!H', data, offset + 2)[0]
+        offset += 4
+    return dst, src, ethertype
+
+
+def is_multicast(mac):
+    return ord(mac[0:1]) & 1 == 1
+
+
+def is_bridge_filtered(mac):
+    return mac[0:5] == BRIDGE_FILTERED and ord(mac[5:6]) <= 0x0f
+
+
+class CamTable(object):
+    """
+    A switch's MAC address table, mapping MACs to the port they were last seen on.
+    MACs are kept as their raw 6 bytes, which hash faster than EthAddrs.
+
+    Entries are kept in the order they were last seen, so inserting,
+    refreshing and evicting the least recently seen MAC are all O(1).
+    When the table is full the least recently seen MAC is evicted, so
+    flooding it with new MACs (e.g. macof) pushes out the real hosts.
+
+    Entries are also aged out when a MAC hasn't been seen for
+    idle_timeout seconds.  Ageing uses a timer wheel: a ring of slots,
+    one per tick, each holding the MACs last seen during that tick.
+    Every tick the wheel turns and the slot it reaches, whose MACs
+    haven't been seen for a full turn, is emptied.  Expiring a MAC is
+    O(1) and a tick only looks at the MACs that expire in it.  A MAC
+    seen just before a tick has one tick less of its turn left, so the
+    wheel has a slot more than idle_timeout needs, and MACs are kept for
+    between idle_timeout and idle_timeout plus a tick.
+    """
+
+    def __init__(self, size, idle_timeout, tick):
+        """
+        :param size: Maximum number of MACs in the table
+        :param idle_timeout: Seconds a MAC is kept for without being seen, 0 to never age out
+        :param tick: Seconds between each turn of the timer wheel
+        """
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.tick_length = tick
+        # MAC -> (port, wheel slot)
+        self.entries = OrderedDict()
+        # A turn of the wheel, less the tick a MAC may be seen at the end of, takes at least idle_timeout seconds
+        slots = int(math.ceil(float(idle_timeout) / tick)) + 1 if idle_timeout else 0
+        self.wheel = [set() for _ in range(slots)]
+        self.slot = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, mac):
+        return mac in self.entries
+
+    def get(self, mac):
+        """ Returns the port a MAC was last seen on, or None """
+        entry = self.entries.get(mac)
+        return entry[0] if entry is not None else None
+
+    def learn(self, mac, port):
+        """
+        Records a MAC as seen on a port, making it the most recently seen.
+
+        Returns the (MAC, port) evicted to make room for it, or None
+        """
+        evicted = None
+        entry = self.entries.pop(mac, None)
+        if entry is not None:
+            self._unschedule(mac, entry[1])
+        elif len(self.entries) >= self.size:
+            old_mac, (old_port, old_slot) = self.entries.popitem(last=False)
+            self._unschedule(old_mac, old_slot)
+            evicted = (old_mac, old_port)
+        self.entries[mac] = (port, self.slot)
+        if self.wheel:
+            self.wheel[self.slot].add(mac)
+        return evicted
+
+    def _unschedule(self, mac, slot):
+        if self.wheel:
+            self.wheel[slot].discard(mac)
+
+    def snapshot(self):
+        """
+        Returns the MAC, port and seconds since seen of each MAC, least recently
+        seen first.  Seconds are to the tick, and None if MACs don't age out.
+        """
+        entries = []
+        for mac, (port, slot) in self.entries.items():
+            idle = None
+            if self.wheel:
+                idle = ((self.slot - slot) % len(self.wheel)) * self.tick_length
+            entries.append({'mac': str(EthAddr(mac)), 'port': port, 'idle': idle})
+        return entries
+
+    def tick(self):
+        """
+        Turns the wheel by one slot, removing MACs that haven't been seen
+        for idle_timeout seconds.
+
+        Returns the (MAC, port) pairs removed
+        """
+        if not self.wheel:
+            return []
+        self.slot = (self.slot + 1) % len(self.wheel)
+        expired = self.wheel[self.slot]
+        self.wheel[self.slot] = set()
+        return [(mac, self.entries.pop(mac)[0]) for mac in expired]
+
+
+class Histogram(object):
+    """
+    Counts observations into buckets with fixed upper bounds, as a
+    Prometheus histogram does.  Observing is a binary search and an add.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus one for values above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ Returns (upper bound, count of values at or below it) pairs, ending with +Inf """
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
 
 
 class LearningSwitch(EventMixin):
@@ -78,14 +266,26 @@ class LearningSwitch(EventMixin):
        6a) Send buffered packet out appopriate port
     """
 
-    def __init__(self, connection, transparent):
+    def __init__(self, connection, transparent, table, mode='packet_out', flow_timeout=(10, 30), fast_path=False):
         # Switch we'll be adding L2 learning switch capabilities to
         self.connection = connection
         self.transparent = transparent
+        self.mode = mode
+        # (idle, hard) timeout of installed flows
+        self.flow_timeout = flow_timeout
+        # Read just the Ethernet header of packets, parsing all of a packet
+        # only when a flow needs matching on it
+        self.fast_path = fast_path
 
         # Our table
-        self.macToPort = {}
-        self.macHistory = deque()
+        self.macToPort = table
+
+        # Messages waiting to be sent together by flush()
+        self.outbox = []
+
+        # Statistics, exported by l2_learning
+        self.counters = dict((name, 0) for name, _ in COUNTERS)
+        self.latency = Histogram(LATENCY_BUCKETS)
 
         # We want to hear PacketIn messages, so we listen
         self.listenTo(connection)
@@ -97,8 +297,23 @@ class LearningSwitch(EventMixin):
         """
         Handles packet in messages from the switch to implement above algorithm.
         """
+        started = time.time()
+        self.counters['packet_ins'] += 1
+        try:
+            self._forward(event)
+        finally:
+            self.flush()
+            self.latency.observe(time.time() - started)
 
-        packet = event.parse()
+    def _forward(self, event):
+        header = parse_header(event.ofp.data) if self.fast_path else None
+        if header is None:
+            packet = event.parse()
+            if not packet.parsed:
+                log.warning("Ignoring incomplete packet on %s", dpidToStr(event.dpid))
+                return
+            header = (packet.dst.toRaw(), packet.src.toRaw(), packet.effective_ethertype)
+        dst, src, ethertype = header
 
         def flood():
             """ Floods the packet """
@@ -116,91 +331,272 @@ class LearningSwitch(EventMixin):
                 # log.info("Holding down flood for %s", dpidToStr(event.dpid))
             msg.buffer_id = event.ofp.buffer_id
             msg.in_port = event.port
-            self.connection.send(msg)
+            self.send(msg)
+            self.counters['flooded'] += 1
 
         def drop(duration=None):
             """
             Drops this packet and optionally installs a flow to continue
             dropping similar ones for a while
             """
+            self.counters['dropped'] += 1
             if duration is not None:
                 if not isinstance(duration, tuple):
                     duration = (duration, duration)
                 msg = of.ofp_flow_mod()
-                msg.match = of.ofp_match.from_packet(packet)
+                msg.match = of.ofp_match.from_packet(event.parse())
                 msg.idle_timeout = duration[0]
                 msg.hard_timeout = duration[1]
                 msg.buffer_id = event.ofp.buffer_id
-                self.connection.send(msg)
+                self.send(msg)
             elif event.ofp.buffer_id != -1:
                 msg = of.ofp_packet_out()
                 msg.buffer_id = event.ofp.buffer_id
                 msg.in_port = event.port
-                self.connection.send(msg)
+                self.send(msg)
 
-        if (len(self.macToPort) >= MAX_TABLE_SIZE):
-            # evict oldest entry
-            evictEntry = self.macHistory.popleft()
-            evicted = self.macToPort.pop(evictEntry, None)
-            log.debug("!!! MAC Table overflowed -- remove old entry %s %s" % (evictEntry, evicted))
-            # flood()
-
-        self.macToPort[packet.src] = event.port  # 1
-        self.macHistory.append(packet.src)
+        known = self.macToPort.get(src)
+        evicted = self.macToPort.learn(src, event.port)  # 1
+        if known is None:
+            self.counters['learned'] += 1
+        elif known != event.port:
+            self.counters['moved'] += 1
+        if evicted is not None:
+            # Only formatted when logged, under macof formatting costs as much as handling the packet
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("!!! MAC Table overflowed -- remove old entry %s %s", EthAddr(evicted[0]), evicted[1])
+            self.counters['evicted'] += 1
+            self.forget(evicted[0])
         if not self.transparent:
-            if packet.type == packet.LLDP_TYPE or packet.dst.isBridgeFiltered():  # 2
+            if ethertype == ethernet.LLDP_TYPE or is_bridge_filtered(dst):  # 2
                 drop()
                 return
 
-        if packet.dst.isMulticast():
+        if is_multicast(dst):
             flood()  # 3a
         else:
-            if packet.dst not in self.macToPort:  # 4
-                log.debug("Port for %s unknown -- flooding" % (packet.dst,))
+            if dst not in self.macToPort:  # 4
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Port for %s unknown -- flooding", EthAddr(dst))
                 flood()  # 4a
             else:
-                port = self.macToPort[packet.dst]
+                port = self.macToPort.get(dst)
                 if port == event.port:  # 5
                     # 5a
-                    log.warning("Same port for packet from %s -> %s on %s.  Drop." %
-                                (packet.src, packet.dst, port), dpidToStr(event.dpid))
+                    log.warning("Same port for packet from %s -> %s on %s.  Drop.",
+                                EthAddr(src), EthAddr(dst), dpidToStr(event.dpid))
                     drop(10)
                     return
                 # 6
-                log.debug("installing flow for %s.%i -> %s.%i" %
-                          (packet.src, event.port, packet.dst, port))
-                # msg = of.ofp_flow_mod()
-                # msg.match = of.ofp_match.from_packet(packet)
-                # msg.idle_timeout = 10
-                # msg.hard_timeout = 30
-                # msg.actions.append(of.ofp_action_output(port = port))
-                msg = of.ofp_packet_out(in_port=event.port)
+                if self.mode == 'flow':
+                    log.debug("installing flow for %s.%i -> %s.%i",
+                              EthAddr(src), event.port, EthAddr(dst), port)
+                    msg = of.ofp_flow_mod()
+                    msg.match = of.ofp_match.from_packet(event.parse(), event.port)
+                    msg.idle_timeout = self.flow_timeout[0]
+                    msg.hard_timeout = self.flow_timeout[1]
+                else:
+                    msg = of.ofp_packet_out(in_port=event.port)
                 if event.ofp.buffer_id != -1 and event.ofp.buffer_id is not None:
                     msg.buffer_id = event.ofp.buffer_id  # 6a
                 else:
-                    if event.ofp.data:
+                    if not event.ofp.data:
                         return
-                    msg.data = event.ofp.data
+                    # Given the packet_in, a flow_mod sends the packet out with a packet_out of its own
+                    msg.data = event.ofp
                 msg.actions.append(of.ofp_action_output(port=port))
-                self.connection.send(msg)
+                self.send(msg)
+                self.counters['flows_installed' if self.mode == 'flow' else 'forwarded'] += 1
+
+    def send(self, msg):
+        """
+        Queues a message for the switch, sent along with the others by flush()
+        """
+        self.outbox.append(msg.pack())
+
+    def flush(self):
+        """
+        Sends the queued messages to the switch in a single write.
+        """
+        if self.outbox:
+            self.connection.send(b''.join(self.outbox))
+            del self.outbox[:]
+
+    def forget(self, mac):
+        """
+        Removes the flows to and from a MAC that has left the table, so its
+        traffic comes back to the controller and is flooded until relearned.
+
+        Each delete matches on the MAC alone, removing all of its flows at once.
+        """
+        if self.mode != 'flow':
+            return
+        mac = EthAddr(mac)
+        self.send(of.ofp_flow_mod(command=of.OFPFC_DELETE, match=of.ofp_match(dl_dst=mac)))
+        self.send(of.ofp_flow_mod(command=of.OFPFC_DELETE, match=of.ofp_match(dl_src=mac)))
+        self.counters['flows_deleted'] += 2
+
+    def age(self):
+        """
+        Ages out MACs that haven't been seen recently, called every tick.
+        """
+        for mac, port in self.macToPort.tick():
+            log.debug("MAC %s on port %s aged out", EthAddr(mac), port)
+            self.counters['aged'] += 1
+            self.forget(mac)
+        self.flush()
 
 
 class l2_learning(EventMixin):
     """
     Waits for OpenFlow switches to connect and makes them learning switches.
+
+    A single timer ages the MAC tables of every switch, another logs the
+    rate of packet-ins reaching the controller and writes every switch's
+    statistics to a metrics file in the Prometheus text format.
+    SIGUSR1 writes a snapshot of every switch's MAC table as JSON.
+    Both files are removed when POX goes down.
     """
 
-    def __init__(self, transparent):
+    def __init__(self, transparent, table_size, idle_timeout, tick, mode, flow_timeout, stats_interval,
+                 metrics_directory, fast_path, name):
         self.listenTo(core.openflow)
         self.transparent = transparent
+        self.table_size = table_size
+        self.idle_timeout = idle_timeout
+        self.tick = tick
+        self.mode = mode
+        self.flow_timeout = flow_timeout
+        self.fast_path = fast_path
+        # dpid -> LearningSwitch
+        self.switches = {}
+        if idle_timeout:
+            Timer(tick, self._handle_tick, recurring=True)
+        # Packet-ins counted at the last report, including switches that have gone
+        self.reported = 0
+        self.gone = 0
+        self.reported_time = time.time()
+        # Named by the scenario, as each tenant's scenario runs its own controller
+        self.metrics_file = self.snapshot_file = None
+        if metrics_directory:
+            if not os.path.isdir(metrics_directory):
+                os.makedirs(metrics_directory)
+            prefix = os.path.join(metrics_directory, name)
+            self.metrics_file = prefix + '.prom'
+            self.snapshot_file = prefix + '.table.json'
+            core.addListenerByName("GoingDownEvent", self._handle_GoingDown)
+            # The handler runs outside of POX's cooperative threads, so it
+            # leaves the snapshot for them rather than reading the tables mid-change
+            signal.signal(signal.SIGUSR1, lambda signum, frame: core.callLater(self.snapshot))
+        if stats_interval:
+            Timer(stats_interval, self._handle_stats, recurring=True)
 
     def _handle_ConnectionUp(self, event):
         log.debug("Connection %s" % (event.connection,))
-        LearningSwitch(event.connection, self.transparent)
+        table = CamTable(self.table_size, self.idle_timeout, self.tick)
+        self.switches[event.dpid] = LearningSwitch(event.connection, self.transparent, table,
+                                                   self.mode, self.flow_timeout, self.fast_path)
+
+    def _handle_ConnectionDown(self, event):
+        switch = self.switches.pop(event.dpid, None)
+        if switch is not None:
+            self.gone += switch.counters['packet_ins']
+
+    def _handle_tick(self):
+        for switch in self.switches.values():
+            switch.age()
+
+    def _handle_stats(self):
+        now = time.time()
+        total = self.gone + sum(switch.counters['packet_ins'] for switch in self.switches.values())
+        log.info("%s mode: %.1f packet-ins/s over %d switches" %
+                 (self.mode, (total - self.reported) / (now - self.reported_time), len(self.switches)))
+        self.reported = total
+        self.reported_time = now
+        if self.metrics_file:
+            self._write(self.metrics_file, self.metrics())
+
+    def _handle_GoingDown(self, event):
+        # Files of a controller that has gone would otherwise still be scraped
+        for path in (self.metrics_file, self.snapshot_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def metrics(self):
+        """
+        Returns every switch's statistics in the Prometheus text format.
+        """
+        switches = sorted(self.switches.items())
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append("# HELP cam_learning_%s %s" % (name, description))
+            lines.append("# TYPE cam_learning_%s %s" % (name, kind))
+            for suffix, dpid, extra, value in samples:
+                labels = 'dpid="%s",mode="%s"%s' % (dpidToStr(dpid), self.mode, extra)
+                lines.append("cam_learning_%s%s{%s} %s" % (name, suffix, labels, value))
+
+        for name, description in COUNTERS:
+            metric(name + '_total', 'counter', description,
+                   [('', dpid, '', switch.counters[name]) for dpid, switch in switches])
+        metric('table_entries', 'gauge', 'MACs in the table',
+               [('', dpid, '', len(switch.macToPort)) for dpid, switch in switches])
+        metric('table_size', 'gauge', 'Most MACs the table holds',
+               [('', dpid, '', switch.macToPort.size) for dpid, switch in switches])
+        samples = []
+        for dpid, switch in switches:
+            samples.extend(('_bucket', dpid, ',le="%s"' % bound, count)
+                           for bound, count in switch.latency.cumulative())
+            samples.append(('_sum', dpid, '', repr(switch.latency.sum)))
+            samples.append(('_count', dpid, '', sum(switch.latency.counts)))
+        metric('packet_in_seconds', 'histogram', 'Time taken to handle a packet-in', samples)
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Writes every switch's MAC table to the snapshot file.
+        """
+        tables = dict((dpidToStr(dpid), switch.macToPort.snapshot())
+                      for dpid, switch in self.switches.items())
+        self._write(self.snapshot_file, json.dumps(tables, indent=1, sort_keys=True))
+        log.info("Wrote MAC tables to %s" % self.snapshot_file)
+
+    @staticmethod
+    def _write(path, data):
+        # Renamed into place so readers never see half a file
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(data)
+        os.rename(temporary, path)
 
 
-def launch(transparent=False):
+def launch(transparent=False, table_size=100, idle_timeout=300, tick=1,
+           mode='packet_out', flow_idle_timeout=10, flow_hard_timeout=30, stats_interval=5,
+           metrics_directory='/tmp/dvni', fast_path=False, name='cam_learning'):
     """
     Starts an L2 learning switch.
+
+    table_size is the number of MACs each switch learns before evicting
+    the least recently seen.  MACs not seen for idle_timeout seconds are
+    aged out, checked every tick seconds.
+
+    mode is one of MODES.  In flow mode flows expire after
+    flow_idle_timeout seconds idle, or flow_hard_timeout seconds in all.
+    The packet-in rate is logged, and the statistics written to
+    metrics_directory/<name>.prom, every stats_interval seconds, 0 to
+    never.  Sending the controller SIGUSR1 writes its MAC tables to
+    metrics_directory/<name>.table.json.  An empty metrics_directory
+    writes neither.  Files are removed when POX goes down, scenarios also
+    name them after their tenant and remove them when they stop, as POX
+    may be killed.
+
+    fast_path reads just the Ethernet header of each packet, instead of
+    parsing all of it.  It's off until cam_benchmark has measured it
+    against the full parser on a real POX install.
     """
-    core.registerNew(l2_learning, str_to_bool(transparent))
+    if mode not in MODES:
+        raise RuntimeError("mode must be one of %s, not %s" % (", ".join(MODES), mode))
+    core.registerNew(l2_learning, str_to_bool(transparent), int(table_size),
+                     float(idle_timeout), float(tick), mode,
+                     (int(flow_idle_timeout), int(flow_hard_timeout)), float(stats_interval),
+                     metrics_directory, str_to_bool(fast_path), name)
@@ -15,8 +15,9 @@ class Import(PacketSniffing.Import):
     enabled = True
     weight = 40
 
+    packages = ["wireshark", "tcpdump", "ftp", "ettercap-graphical", "dsniff"]
+
     def create_network(self, controller=Controller):
-        self.packages += ["ettercap-graphical", "dsniff"]
         PacketSniffing.Import.create_network(self, controller)
 
     def run_network(self):
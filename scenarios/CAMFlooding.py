@@ -6,9 +6,10 @@ CAM Flooding
 # This import is needed to stop a circular import problem with mininet (https://github.com/mininet/mininet/issues/546)
 # noinspection PyUnresolvedReferences
 import mininet.node
+import os
 from mininet.link import TCLink
 
-from controller import PoxController
+from controller import METRICS_DIRECTORY, PoxController, cam_learning_files
 from scenarios import ArpPoisoning, Scenario
 from utils.arp import net_static_arp
 
@@ -32,15 +33,34 @@ class Import(ArpPoisoning.Import):
         self.net.addLink(switch, self.kali, cls=TCLink, bw=0.25)
 
     def add_controller(self):
-        """Adds a POX controller with the cam_learning switch so that CAM table flooding can be performed against it."""
-        self.net.addController(script='cam_learning')
+        """
+        Adds a POX controller with the cam_learning switch so that CAM table flooding can be performed against it.
+        Known destinations get flows on the switch, so only traffic to unknown MACs goes through the controller.
+        """
+        self.net.addController(script='cam_learning', options={'mode': 'flow',
+                                                                'metrics_directory': METRICS_DIRECTORY,
+                                                                'name': self.metrics_name()})
+
+    def metrics_name(self):
+        """The name of the controller's metrics and MAC table files, e.g. '/tmp/dvni/t3cam_learning.prom'."""
+        return self.tenant.name('cam_learning')
+
+    def cleanup(self):
+        """Extends the base scenario. Removes the controller's metrics files, POX may have been killed before it could."""
+        removed = super(Import, self).cleanup()
+        if self.tenant is not None and not self.dry_run:
+            for path in cam_learning_files(self.metrics_name()):
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+        return removed
 
     def run_network(self):
         """Extends the base scenario. Adds static ARP routes so that an ARP poisioning attack wouldn't work for this scenario."""
         super(Import, self).run_network()
         # Add static ARP entries to the hosts
         # This will stop ARP spoofing attacks
-        net_static_arp(self.net.hosts)
+        self.timings['static_arp'] = net_static_arp(self.net.hosts)[1]
 
     def generate_task(self, doc):
         Scenario.generate_task(self, doc)
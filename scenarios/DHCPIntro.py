@@ -2,8 +2,6 @@
 DHCP Scanning
 =============
 """
-from docx import Document
-from ipaddress import IPv4Address
 from mininet.node import Controller, OVSSwitch, Host
 from typing import List, Any
 
@@ -23,7 +21,8 @@ class Import(Scenario):
 
     kali = None  # type: Kali
     dhcpd = None  # type: Dhcpd
-    ips = None  # type: List[IPv4Address]
+    ips = None  # type: subnet.AddressSampler
+    packages = ["yersinia", "wireshark"]
     network = None
 
     def create_network(self, controller=None):
@@ -31,26 +30,25 @@ class Import(Scenario):
         super(Import, self).create_network(controller)
 
         prefix_length = 27
-        self.network = subnet.generate(prefix_length)
-        self.ips = list(self.network.hosts())
+        self.network = subnet.generate(prefix_length, rng=self.random)
+        self.ips = subnet.AddressSampler(self.network, rng=self.random)
 
         switch = self.net.addSwitch('s1', cls=OVSSwitch, failMode='standalone')
         self.dhcpd = self.net.addDocker('dhcpd',
                                         cls=Dhcpd,
-                                        ip="%s/%s" % (self.ips.pop(0), prefix_length))  # type: Dhcpd
+                                        ip="%s/%s" % (self.ips.take(self.network.network_address + 1), prefix_length))  # type: Dhcpd
         self.dhcpd.add_subnet(self.network, [globals.default_lease_time(120),
                                              globals.min_lease_time(60),
                                              globals.max_lease_time(120)])
         self.kali = self.net.addDocker('kali',
                                        cls=Kali,
+                                       packages=self.packages,
                                        ip="0.0.0.0/32")
 
-        self.kali.install_package('yersinia', 'wireshark')
-
         self.net.addLink(switch, self.dhcpd)
         self.net.addLink(switch, self.kali)
 
-    def generate_task(self, doc=Document()):
+    def generate_task(self, doc):
         super(Import, self).generate_task(doc)
         doc.add_paragraph(
             "In this task your Kali machine is not assigned an IP on the network. There is a DHCP server able to assign you one.")
@@ -5,10 +5,10 @@ DHCP Starvation
 
 # noinspection PyUnresolvedReferences
 import mininet.node
-from docx import Document
 from mininet.link import TCLink
 
 from scenarios import Scenario, DHCPIntro
+from utils import subnet
 
 # Use yersinia to send a RAW packet, is there a response? (Yes)
 # What IP was the response sent from & to (Dhcp IP to broadcast)
@@ -16,7 +16,6 @@ from scenarios import Scenario, DHCPIntro
 # What IP were you offered.
 
 # Use yersinia to send DISCOVER packets, these will be sent continuously until you stop them
-from utils import subnet
 
 
 class Import(DHCPIntro.Import):
@@ -40,7 +39,7 @@ class Import(DHCPIntro.Import):
         self.net.removeLink(link)
         self.net.addLink(switch, self.kali, cls=TCLink, bw=0.25)
 
-    def generate_task(self, doc=Document()):
+    def generate_task(self, doc):
         Scenario.generate_task(self, doc)
         doc.add_paragraph(
             "DHCP servers assign IP addresses within a set range for a set amount of time. "
@@ -54,13 +53,13 @@ class Import(DHCPIntro.Import):
         self.questions += [("Open wireshark/tcpdump to capture packets on the network and use Yersinia to send a RAW DHCP packet", ""),
                            ("What IP responded", self.dhcpd.IP()),
                            ("What IP did it respond to", "255.255.255.255"),
-                           ("What are the network address and netmask for the network that responded", "%s & %s" % (str(subnet.networks[-1].network_address), str(subnet.networks[-1].netmask))),
-                           ("How many IP addresses could be used in this network", str(len(list(subnet.networks[-1].hosts())))),
-                           ("What IP was offered in the response", str(self.ips[0])),
+                           ("What are the network address and netmask for the network that responded", "%s & %s" % (str(self.network.network_address), str(self.network.netmask))),
+                           ("How many IP addresses could be used in this network", str(subnet.host_count(self.network))),
+                           ("What IP was offered in the response", str(self.network.network_address + 2)),
                            ("Now use Yersinia to send DISCOVER packets, these will be sent continuously until you stop them in 'list attacks'. "
                             "After 10+ seconds check wireshark, filter for responses from the server offering IP addresses (bootp.option.dhcp==2). "
-                            "How many offers were received", "Should be %s as all IP adresses in the network are unused excluding the DHCP server IP." % str(len(list(subnet.networks[-1].hosts()))-1)),
-                           ("How long before all offers ceased, and the DHCP server was 'starved'", "~%.2f during testing, but any reasonable answer is acceptable." % (0.015*len(list(subnet.networks[-1].hosts()))-1)),
+                            "How many offers were received", "Should be %s as all IP adresses in the network are unused excluding the DHCP server IP." % str(subnet.host_count(self.network)-1)),
+                           ("How long before all offers ceased, and the DHCP server was 'starved'", "~%.2f during testing, but any reasonable answer is acceptable." % (0.015*subnet.host_count(self.network)-1)),
                            ("Run the starvation attack again, after a short wait attempt to use dhclient to get an IP address, does this work", "No")]
 
 
@@ -2,8 +2,6 @@
 Host Scanning
 =============
 """
-import random
-
 from ipaddress import IPv4Address, IPv4Network
 from mininet.node import Controller
 
@@ -36,21 +34,21 @@ class Import(Scenario):
         # Add switch
         switch = self.net.addSwitch('s1')
         # Create a random subnet to add hosts to
-        self.prefixlen = random.randint(24, 27)
-        self.subnet = subnet.generate(self.prefixlen)
-        hosts = list(self.subnet.hosts())
-        # Add kali
+        self.prefixlen = self.random.randint(24, 27)
+        self.subnet = subnet.generate(self.prefixlen, rng=self.random)
+        hosts = subnet.AddressSampler(self.subnet, rng=self.random)
+        # Add kali, with the last host address
         self.kali = self.net.addDocker('kali',
                                        cls=Kali,
-                                       ip="%s/%s" % (hosts.pop(), self.prefixlen))
+                                       ip="%s/%s" % (hosts.take(self.subnet.broadcast_address - 1), self.prefixlen))
 
         self.net.addLink(switch, self.kali)
-        for i in range(0, random.randint(10, 25)):
+        for i in range(0, self.random.randint(10, 25)):
             # If the host list is empty, exit
             if not hosts:
                 break
-            # Get a random IP from the list of hosts
-            ip = hosts.pop(random.randrange(len(hosts)))
+            # Get a random IP from the unused hosts
+            ip = hosts.pop()
             # Add a host
             host = self.net.addHost('h' + str(i), ip="%s/%s" % (ip, self.prefixlen))
             # Link host to switch
@@ -81,7 +79,7 @@ class Import(Scenario):
                            ("What IP adresses are found to have hosts up", "\n"+("\n".join(
                                host.IP() for
                                host in sorted(self.net.hosts, key=lambda x: int(IPv4Address(x.IP())))
-                               if host.name != 'kali')))]
+                               if host is not self.kali)))]
 
 
 if __name__ == "__main__":
@@ -3,8 +3,6 @@ Packet Sniffing
 ===============
 """
 
-import random
-
 from mininet.node import OVSSwitch
 
 from utils import subnet
@@ -23,7 +21,7 @@ class Import(Scenario):
     connection_wait = 5  # Number of seconds between ftp connections
 
     ftpd = None
-    ftp_clients = []
+    ftp_clients = None
     kali = None
     switch = None
 
@@ -38,13 +36,14 @@ class Import(Scenario):
         Scenario.create_network(self, controller)
         self.add_switch()
         # Create a random subnet to add hosts to
-        prefixlen = random.randint(27, 29)
-        hosts = list(subnet.generate(prefixlen).hosts())
-        # Add kali
+        prefixlen = self.random.randint(27, 29)
+        network = subnet.generate(prefixlen, rng=self.random)
+        hosts = subnet.AddressSampler(network, rng=self.random)
+        # Add kali, with the last host address
         self.kali = self.net.addDocker('kali',
                                        cls=Kali,
-                                       ip="%s/%s" % (hosts.pop(), prefixlen))
-        self.kali.install_package(*self.packages)
+                                       packages=self.packages,
+                                       ip="%s/%s" % (hosts.take(network.broadcast_address - 1), prefixlen))
         self.net.addLink(self.switch, self.kali)
         # Add ftpd
         self.ftpd = self.net.addDocker('ftp',
@@ -52,7 +51,8 @@ class Import(Scenario):
                                        ip="%s/%s" % (hosts.pop(), prefixlen))
         self.net.addLink(self.switch, self.ftpd)
         # Add ftp client
-        for i in range(random.randrange(1, 5)):
+        self.ftp_clients = []
+        for i in range(self.random.randrange(1, 5)):
             ftpc = self.net.addHost('ftpc'+str(i),
                                     ip="%s/%s" % (hosts.pop(), prefixlen))
             self.net.addLink(self.switch, ftpc)
@@ -64,7 +64,7 @@ class Import(Scenario):
     def add_ftp(self):
         """Adds credentials to the FTP server and sets the clients to make authentication temps to the server. One client is given the correct credentials."""
         # 20 hex digit password
-        self.pw = [generate_password() for _ in self.ftp_clients]
+        self.pw = [generate_password(rng=self.random) for _ in self.ftp_clients]
         add_user(self.ftpd, self.user, self.pw[0])
         for i in range(len(self.ftp_clients)):
             self.ftp_clients[i].sendCmd("\n".join([
@@ -3,11 +3,10 @@ Port Scanning
 =============
 """
 
-import random
-
 from ipaddress import IPv4Address
 
 from scenarios import Scenario, HostScanning
+from utils.readiness import tcp_listen
 
 top_100_ports = [7, 9, 13, 21, 22, 23, 25, 26, 37, 53, 79, 80, 81, 88, 106, 110, 111, 113, 119, 135, 139, 143, 144, 179,
                  199, 389, 427, 443, 444, 445, 465, 513, 514, 515, 543, 544, 548, 554, 587, 631, 646, 873, 990, 993,
@@ -30,13 +29,14 @@ class Import(HostScanning.Import):
         Scenario.run_network(self)
         # Open random top ports for scanning
         for host in self.net.hosts:
-            if host.name == 'kali':
+            if host is self.kali:
                 continue
             host.taskPorts = []
-            for port in range(0, random.randint(0, 4)):
-                host.taskPorts.append(random.choice(top_100_ports))
+            for port in range(0, self.random.randint(0, 4)):
+                host.taskPorts.append(self.random.choice(top_100_ports))
             for port in host.taskPorts:
                 host.cmd('nc', '-l', '-d', '-p', port, '&')
+            self.add_probes(host, *[tcp_listen(port) for port in host.taskPorts])
         if self.developer:
             self.kali.cmd('ip a')
             self.kali.cmd('nmap -v %s/%s' % (self.kali.defaultIntf().IP(), self.prefixlen))
@@ -50,7 +50,7 @@ class Import(HostScanning.Import):
                                         '\t'.join(str(port) for port in host.taskPorts))
                                    for host in
                                    sorted(self.net.hosts, key=lambda x: int(IPv4Address(x.IP())))
-                                   if host.name != 'kali'))))
+                                   if host is not self.kali))))
 
 
 if __name__ == "__main__":
@@ -3,9 +3,7 @@ VLAN Double Tagging
 ===================
 """
 
-import random
-
-from container.kali import Kali, VNC_DEFAULT, WEB_DEFAULT
+from container.kali import Kali
 from scenarios import VlanTrunking, Scenario
 #TODO: Explain how double tagging works and why it is unidirectional
 from utils.vlan import VlanMode
@@ -28,13 +26,11 @@ class Import(VlanTrunking.Import):
         # Add a second Kali to the second switch in the second VLAN
         self.kali_receive = self.net.addHost('kali2',
                                              cls=Kali,
-                                             vnc=VNC_DEFAULT + 1,
-                                             web=WEB_DEFAULT + 1,
                                              ip="%s/%s" % (self.hosts.pop(), self.prefixlen))
         link = self.net.addLink(self.switches[1], self.kali_receive)
         self.switches[1].addTag(link.intf1, self.vlans[1])
         # If the mode is ACCESS the Kali machine will receive packets with no VLAN tag
-        self.receive_mode = random.choice([VlanMode.ACCESS, VlanMode.TAGGED])
+        self.receive_mode = self.random.choice([VlanMode.ACCESS, VlanMode.TAGGED])
         self.switches[1].addMode(link.intf1, self.receive_mode)
 
         # Replace the mode on Kali1 with native-untagged
@@ -2,8 +2,6 @@
 VLAN Trunking
 =============
 """
-import random
-
 from container.kali import Kali
 from scenarios import Scenario
 from utils import subnet
@@ -24,7 +22,7 @@ class Import(Scenario):
     enabled = True
     weight = 60
 
-    hosts = None
+    hosts = None  # type: subnet.AddressSampler
     kali = None  # type: Kali
     switches = None
 
@@ -33,22 +31,21 @@ class Import(Scenario):
         self.prefixlen = prefixlen
         self.switch_count = switch_count
         if self.switch_count is None:
-            self.switch_count = random.randrange(3, 8)
+            self.switch_count = self.random.randrange(3, 8)
         self.host_count = host_count
         if self.host_count is None:
-            self.host_count = random.randrange(10, 30)
+            self.host_count = self.random.randrange(10, 30)
         self.vlans = vlans
         if self.vlans is None:
-            vlans = range(1, 10)
-            random.shuffle(vlans)
+            vlans = list(range(1, 10))
+            self.random.shuffle(vlans)
             self.vlans = [vlans.pop() for _ in range(vlan_count)]
             # self.vlans = random_vlans(vlan_count)
 
     def create_network(self, controller=None):
         super(Import, self).create_network(controller)
 
-        self.hosts = list(subnet.generate(self.prefixlen).hosts())
-        random.shuffle(self.hosts)
+        self.hosts = subnet.AddressSampler(subnet.generate(self.prefixlen, rng=self.random), rng=self.random)
 
         # Add switches
         self.switches, switch_links = add_switches(self.net, self.switch_count, cls=VlanSwitch, failMode='standalone')
@@ -75,9 +72,9 @@ class Import(Scenario):
 
         # Add the hosts to a random switch with a random VLAN
         for host in hosts:
-            switch = random.choice(self.switches)
+            switch = self.random.choice(self.switches)
             link = self.net.addLink(switch, host)
-            host.vlan = random.choice(self.vlans)
+            host.vlan = self.random.choice(self.vlans)
             switch.addTag(link.intf1, host.vlan)
             switch.addMode(link.intf1, VlanMode.ACCESS)  # NOTE: Access is the default mode for ports with a tag
 
@@ -3,24 +3,27 @@ Scenarios
 =========
 """
 
-import logging
 import os
 import random
+import time
 
-from docx import Document
-from mininet.clean import cleanup, killprocs, Cleanup
+from mininet.clean import killprocs, Cleanup
 from mininet.cli import CLI
-from mininet.log import info, setLogLevel
+from mininet.log import info, setLogLevel, warn
 from mininet.net import Containernet
-from mininet.node import Controller
-from pyftpdlib.authorizers import DummyAuthorizer
-from pyftpdlib.handlers import FTPHandler
-from pyftpdlib.servers import MultiprocessFTPServer
+from mininet.node import Controller, Node, OVSSwitch
 
 from container.kali import Kali
 from controller import PoxController
+from utils import docserver, session
+from utils.cleanup import cleanup_network
+from utils.dryrun import DryNet
+from utils.network import rand_mac
+from utils.readiness import Probe, controller_connected, ovs_port_up, wait_ready
+from utils.sheet import Sheet
+from utils.tenant import Tenant, claim, tenant_net
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 # Add a cleanup command to mininet.clean to clean pox controller
 Cleanup.addCleanupCallback(lambda: killprocs(PoxController.pox_comand))
@@ -40,9 +43,11 @@ class Scenario(object):
     """If the scenario should be shown to users."""
     weight = -1
     """Used to order scenarios before presenting them to users, the lower the weight the earlier in the list."""
+    packages = []
+    """APT packages the scenario's Kali machine needs, installed in an image built ahead of time."""
 
-    def __init__(self, teacher=False, developer=False, seed=None):
-        # type: (bool, bool, str) -> None
+    def __init__(self, teacher=False, developer=False, seed=None, dry_run=False):
+        # type: (bool, bool, str, bool) -> None
         """
         :type teacher: bool
         :param teacher: Is the user a teacher.
@@ -50,27 +55,51 @@ class Scenario(object):
         :param developer: Is the user a developer.
         :type seed: str
         :param seed: str: Random number generator seed, likely student ID.
+        :type dry_run: bool
+        :param dry_run: Build the network in memory with `DryNet` instead of Containernet, only the documents are produced.
         """
         self.teacher = teacher
         self.developer = developer
+        self.dry_run = dry_run
         self.net = None  # type: Containernet
-        """Containernet: The network of devices."""
+        """Containernet: The network of devices. A `DryNet` when `dry_run` is set."""
+        self.tenant = None  # type: Tenant
+        """Tenant: Prefixes the names of the network's nodes so other scenarios can run on the VM at the same time."""
+        self.stopped = False
+        """bool: If `stop` has been called, a network is only stopped once."""
         self.questions = []  # type: List[Tuple[str, str]]
         """List[Tuple[str, str]]: List of question & answer combinations used for task & answer documents."""
-        self.answer_document = Document()
-        """Document: `python-docx` document used to provide the scenario answers to teachers."""
-        self.task_document = Document()
-        """Document: `python-docx` document used to provide the scenario task to users."""
+        self.answer_document = Sheet()
+        """Sheet: Document used to provide the scenario answers to teachers, with the API of a `python-docx` document."""
+        self.task_document = Sheet()
+        """Sheet: Document used to provide the scenario task to users."""
+        self.student_directory = './student/'
+        """str: Location of the student-accessible folder on the VM, used when saving documents."""
+        self.teacher_directory = './teacher/'
+        """str: Location of the teacher-accessible folder on the VM, used when saving documents."""
+        self.student_documents = []  # type: List[str]
+        """List[str]: Paths of the documents saved for the student, published by `publish_documents`."""
+        self.timings = {}  # type: Dict[str, float]
+        """Dict[str, float]: Seconds taken by each phase of `run` and `stop`, keyed by the phase name."""
+        self.probes = {}  # type: Dict[Node, List[Probe]]
+        """Dict[Node, List[Probe]]: Readiness checks added by the scenario, run with those of each node and switch by `wait_ready`."""
+        self.ready_times = {}  # type: Dict[str, float]
+        """Dict[str, float]: Seconds each node took to become ready, None if it never did."""
         # Use the inputted seed, if given, to randomise the network
         self.seed = seed
         """Seed parameter passed to __init__, used to randomise the network parameters. 
         Added to answer sheets given to teachers so they know the student's ID."""
         if self.seed is not None:
-            random.seed(self.name + self.seed)
+            self.random = random.Random(self.name + self.seed)
             # If no seed, set seed to "random"
             # to indicate the outputted docuemnts are for a random seed
         else:
+            self.random = random.Random()
             self.seed = "random"
+        """random.Random: The scenario's own random number generator, every random choice should be made with it
+        so scenarios can be generated at the same time and stay the same for the same seed."""
+        self.session = session.begin(self.random)
+        """Session: Subnets, VLANs and containers used by this run, released when the network is stopped."""
 
     def run(self):
         """Main function that executes the rest of the scenario."""
@@ -83,27 +112,103 @@ class Scenario(object):
             # Show debug logs for development
             setLogLevel('debug')
         # Create Containernet network
+        started = time.time()
         self.create_network()
+        self.timings['create_network'] = time.time() - started
         # Start Containernet network
+        started = time.time()
         self.run_network()
+        self.timings['run_network'] = time.time() - started
+        # Wait for services to be usable before handing the network over
+        if not self.dry_run:
+            started = time.time()
+            self.wait_ready()
+            self.timings['ready'] = time.time() - started
         # Generate task/answer sheets
+        started = time.time()
         self.generate_task(self.task_document)
         self.generate_questions()
         self._add_questions(self.task_document)
         self._add_answers(self.answer_document)
         self.save_documents()
-        if self.developer:
+        self.timings['documents'] = time.time() - started
+        if self.developer and not self.dry_run:
             # If we're a developer, start the CLI
             # so we can test from the command line
             CLI(self.net)
-            self.net.stop()
+            self.stop()
         return
 
+    def stop(self):
+        """
+        Stops the network, if one was created, and ends the scenario's session.
+        Anything left over, e.g. when the network failed part way through starting, is removed by `cleanup`.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        started = time.time()
+        try:
+            if self.net is not None:
+                self.net.stop()
+        finally:
+            self.cleanup()
+            session.end(self.session)
+            self.timings['teardown'] = time.time() - started
+
+    def cleanup(self):
+        # type: () -> List[str]
+        """
+        Removes the containers, switches, links, controllers and namespaces created by this scenario only.
+        Unlike `mininet.clean.cleanup`, other scenarios running on the VM are left alone.
+
+        :return: Names of the leftover resources that were removed.
+        """
+        if self.net is None or self.dry_run:
+            return []
+        return cleanup_network(self.net)
+
+    def add_probes(self, node, *probes):
+        # type: (Node, *Probe) -> None
+        """Adds readiness checks for a node, e.g. for a service started by the scenario."""
+        self.probes.setdefault(node, []).extend(probes)
+
+    def wait_ready(self, timeout=30):
+        # type: (float) -> None
+        """
+        Waits until every node's services are ready, or until the timeout.
+        Checks the probes of each container (see `container.Docker.probes`), the ports and controller connection of
+        each switch, and any added with `add_probes`.
+        """
+        probes = {}
+        for host in self.net.hosts:
+            probes[host] = host.probes() if hasattr(host, 'probes') else []
+        for switch in self.net.switches:
+            if isinstance(switch, OVSSwitch):
+                probes[switch] = [ovs_port_up(intf.name) for intf in switch.intfList() if intf.name != 'lo']
+                # Standalone switches work without a controller
+                if self.net.controllers and switch.failMode != 'standalone':
+                    probes[switch].append(controller_connected(switch.name))
+        for node, node_probes in self.probes.items():
+            probes.setdefault(node, []).extend(node_probes)
+        self.ready_times = {node.name: seconds for node, seconds in wait_ready(probes, timeout).items()}
+
     def create_network(self, controller=Controller):
         """Create Containernet network."""
-        info('*** Running Cleanup\n')
-        cleanup()
-        self.net = Containernet(controller=controller)
+        if self.dry_run:
+            # Nothing is started, so there's nothing to clean up.
+            # Nodes are named as the first tenant's are, so sheets match a scenario running on its own,
+            # but the tenant isn't leased as nothing is started
+            self.tenant = Tenant(0)
+            self.net = tenant_net(DryNet, self.tenant, allocate_ports=False, controller=controller, rng=self.random)
+        else:
+            # Leftovers of this scenario are removed by `cleanup` when it stops,
+            # a global cleanup would also remove the networks of other scenarios running on the VM
+            self.tenant = claim()
+            info('*** Running as tenant %d\n' % self.tenant.number)
+            self.net = tenant_net(Containernet, self.tenant, controller=controller)
+            # Link MACs are drawn from the scenario's generator rather than the random module
+            self.net.randMac = lambda: rand_mac(self.random)
         if controller is not None:
             self.add_controller()
 
@@ -140,15 +245,15 @@ class Scenario(object):
             else:
                 doc.add_paragraph(question[0])
 
-    def save_documents(self, studentDirectory='./student/', teacherDirectory='./teacher/', studentAllowedAnswers=False,
+    def save_documents(self, studentDirectory=None, teacherDirectory=None, studentAllowedAnswers=False,
                        staticTaskDocument=True):
         """
         Saves the task and answer documents locally so they can be provided to users.
 
-        :param studentDirectory: Location of the student-accessible folder on the VM
+        :param studentDirectory: Location of the student-accessible folder on the VM, defaults to `student_directory`
         :type studentDirectory: string
 
-        :param teacherDirectory: Location of the teacher-accessible folder on the VM
+        :param teacherDirectory: Location of the teacher-accessible folder on the VM, defaults to `teacher_directory`
         :type teacherDirectory: string
 
         :param studentAllowedAnswers: Is the student provided the answer document for the task.
@@ -157,6 +262,10 @@ class Scenario(object):
         :param staticTaskDocument: Is the task document the same for every student.
         :type staticTaskDocument: bool
         """
+        if studentDirectory is None:
+            studentDirectory = self.student_directory
+        if teacherDirectory is None:
+            teacherDirectory = self.teacher_directory
         # Create neccisary directories if they do not exist
         for directory in [studentDirectory, teacherDirectory]:
             if not os.path.exists(directory):
@@ -169,6 +278,7 @@ class Scenario(object):
         # If we're a student, generate a document named "[Scenario name]-answers.docx"
         if studentAllowedAnswers:
             self.answer_document.save(studentDirectory + self.name + '-answers.docx')
+            self.student_documents.append(studentDirectory + self.name + '-answers.docx')
 
         # -- Task sheet --
 
@@ -180,44 +290,31 @@ class Scenario(object):
         # If we're a student
         # if not self.teacher:
         self.task_document.save(studentDirectory + self.name + '.docx')
+        self.student_documents.append(studentDirectory + self.name + '.docx')
 
-    def run_ftp(self, studentDirectory='./student/', teacherDirectory='./teacher'):
+    def publish_documents(self):
+        # type: () -> Tuple[str, str]
         """
-        Runs a PyFTPlib FTP server to provide users with access to their task/answer documents.
+        Makes the task/answer documents available on the VM's document server, starting the server if it isn't running.
+        Students get their own account holding their documents, named after their ID.
+        The teacher account holds every answer sheet in `teacher_directory`.
 
-        :param studentDirectory: Location of the student-accessible folder on the VM
-        :type studentDirectory: string
-
-        :param teacherDirectory: Location of the teacher-accessible folder on the VM
-        :type teacherDirectory: string
+        :return: The username and password to log in with.
         """
-
-        authorizer = DummyAuthorizer()
-        pw = '%05x' % random.randrange(16 ** 5)
+        # A new random password each time, only shown to whoever published the documents
+        pw = docserver.new_password()
         if self.teacher:
-            authorizer.add_user(username="teacher", password=pw, homedir=teacherDirectory)
+            username = 'teacher'
+            docserver.register(username, pw, homedir=self.teacher_directory)
         else:
-            authorizer.add_user(username="student", password=pw, homedir=studentDirectory)
-        handler = FTPHandler
-        handler.authorizer = authorizer
-
-        handler.banner = "DVNG tasks ftp server"
-
-        # Instantiate FTP server class and listen on 0.0.0.0:2121
-        address = ('', 21)
-        server = MultiprocessFTPServer(address, handler)
-
-        # set a limit for connections
-        server.max_cons = 256
-        server.max_cons_per_ip = 5
-
-        # start ftp server
-        print("Task sheets are available over ftp on port 21\n" +
-              "\tUsername: %s\n" % ("teacher" if self.teacher else "student") +
-              "\tPassword: %s\n" % pw +
-              "Keep this terminal open until you've retreived your files.")
-        logging.basicConfig(level=logging.CRITICAL)
-        server.serve_forever()
+            username = self.seed
+            docserver.register(username, pw, files=self.student_documents)
+        if not docserver.ensure_running():
+            warn('*** The document server isn\'t running, see %s/docserver.log\n' % docserver.DOCUMENT_ROOT)
+        print("Task sheets are available over ftp on port %d\n" % docserver.PORT +
+              "\tUsername: %s\n" % username +
+              "\tPassword: %s" % pw)
+        return username, pw
 
     def run_network(self):
         """Starts the Containernet network."""
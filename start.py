@@ -11,17 +11,24 @@ It allows the user to select the scenario they are taking part in and provides t
 import os
 import importlib
 import argparse
+import signal
 import sys
+import time
 
-import random
 
-from mininet.log import setLogLevel
+from utils.answerbook import AnswerBook, FORMATS
+from utils.batch import run_batch
+from utils.catalog import catalog
+from utils.report import write_report
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import List, Type
-    from scenarios import Scenario
+    from typing import List
+    from utils.catalog import Entry
+
+# Used to report how long it takes for the menu to be shown
+started = time.time()
 
 
 def _choice_from_list(l, name='item'):
@@ -78,6 +85,21 @@ def get_args():
                         help='The user account to run as (student/teacher).',
                         choices=['student', 'teacher'],
                         nargs='?')  # Sets optional
+    parser.add_argument('--workers',
+                        help='The number of student IDs generated at the same time in a batch.',
+                        type=int,
+                        default=1)
+    parser.add_argument('--dry-run',
+                        help='Only generate task and answer sheets, without starting the networks.',
+                        action='store_true')
+    parser.add_argument('--kali-pool',
+                        help='The number of started Kali containers kept ready for scenarios to use.',
+                        type=int,
+                        default=0)
+    parser.add_argument('--answer-book',
+                        help='Write the answers of a batch to a single file of this format, '
+                             'instead of an answer sheet per student ID.',
+                        choices=FORMATS)
     args = parser.parse_args()
 
     if args.account:
@@ -112,7 +134,11 @@ def get_args():
     return {
         'directory': os.path.dirname(os.path.realpath(__file__)),  # Get current directory
         'teacher': isTeacher,
-        'developer': isDeveloer
+        'developer': isDeveloer,
+        'workers': args.workers,
+        'dry_run': args.dry_run,
+        'kali_pool': args.kali_pool,
+        'answer_book': args.answer_book
     }
 
 
@@ -134,40 +160,81 @@ def containers(args):
     importlib.import_module("container.%s.example" % choices[index])
 
 
+def build_containers(args):
+    """
+    Builds every container image ahead of time, so the first run of each scenario doesn't have to.
+
+    :param args: Arguments from the 'get_args' function in this module.
+    """
+    # Imported here as docker and mininet are slow to import
+    from container import prebuild
+    # Kali is also built with each scenario's packages installed
+    prebuild(packages={'dvni/kali': _package_sets(args)})
+
+
+def _package_sets(args):
+    """
+    Lists the distinct sets of Kali packages used by the scenarios.
+
+    :param args: Arguments from the 'get_args' function in this module.
+    :rtype: List[List[str]]
+    """
+    return [list(p) for p in sorted(set(tuple(sorted(s.packages)) for s in get_scenarios(args['directory'] + "/scenarios")
+                                        if s.packages))]
+
+
+def package_report(args):
+    """
+    Compares installing each scenario's Kali packages at start-up against using an image with them already installed.
+
+    :param args: Arguments from the 'get_args' function in this module.
+    """
+    from container.kali import package_report as report
+    for packages in _package_sets(args):
+        report(packages)
+
+
+def fill_kali_pool(args):
+    """
+    Starts Kali containers ahead of time so scenarios can use one that has already booted, then prints the pool's statistics.
+
+    :param args: Arguments from the 'get_args' function in this module.
+    """
+    from container.kali import kali_pool
+    pool = kali_pool(max(1, args['kali_pool']))
+    started = pool.fill(wait=True)
+    stats = pool.stats()
+    print("*** Started %d Kali containers, %d of %d ready" % (started, stats['idle'], stats['size']))
+    if stats['ready_time'] is not None:
+        print("*** Average time to ready: %.1fs" % stats['ready_time'])
+
+
 def get_scenarios(directory):
-    # type: (str) -> List[Type[Scenario]]
+    # type: (str) -> List[Entry]
     """
     Gets a list of enabled scenarios in the given directory and returns them.
     Scenarios are listed by their 'weight', a value defined in their class used for ordering.
+    The scenarios are read from their source and are not imported, use `Entry.load` to import the chosen one.
 
     Example:
         >>> print(get_scenarios('/vagrant/scenarios/')[0].name)
         Host Scanning
 
     :param directory: Directory to look for scenarios in, usually '$ProjectRoot/scenarios/'
-    :return: List[Scenario]
+    :return: List[Entry]
     """
-    # Only get scenarios that:
-    #   end in .py
-    #   don't begin with '__', these for are internal usage such as __init__
-    choices = list(x[:-3] for x in os.listdir(directory) if x[-3:] == ".py" and x[:2] != "__")
-    # Import the scenarios and store them
-    choices = [importlib.import_module("scenarios.%s" % c) for c in choices]
-    # Only include the scenarios that have an 'Import' class
-    choices = [c.Import for c in choices if hasattr(c, 'Import')]
-    # Check the choices for enabled flag, if not enabled remove them
-    choices = [scenario for scenario in choices
-               if hasattr(scenario, 'enabled')
-               and scenario.enabled]
-
+    # Only include enabled scenarios
+    choices = [scenario for scenario in catalog(directory) if scenario.enabled]
     # Order choices by their given weights
-    choices.sort(key=lambda x: x.weight if hasattr(x, 'weight') else sys.maxint)
+    choices.sort(key=lambda x: x.weight)
     return choices
 
 
 def test_scenarios(args):
     """
-    Runs every enables scenario with the seed 1-5 for testing purposes
+    Runs every enables scenario with the seed 0-4 for testing purposes.
+    Runs are spread across the '--workers' processes, a failing run doesn't stop the others.
+    The time taken by each phase is written to 'scenario-report.json' and 'scenario-report.csv'.
 
     :param args: Arguments from the 'get_args' function in this module.
 
@@ -175,11 +242,10 @@ def test_scenarios(args):
          Could generate random seeds for this? [Priority=low]
     """
     choices = get_scenarios(args['directory'] + "/scenarios")
-    setLogLevel("error")
-    for seed in range(5):
-        for scenario in choices:
-            print('*** %s SEED:%s' % (scenario.name, str(seed)))
-            scenario(teacher=True, seed=str(seed)).run()
+    results = run_batch([(scenario.module, str(seed)) for seed in range(5) for scenario in choices],
+                        workers=args['workers'], dry_run=args['dry_run'])
+    write_report(results, 'scenario-report')
+    print("*** Timing report written to scenario-report.json and scenario-report.csv")
 
 
 def run_scenario(args):
@@ -192,18 +258,35 @@ def run_scenario(args):
     choices = get_scenarios(args['directory'] + "/scenarios")
     # Get the user's chosen scenario
     index = _choice_from_list([scenario.name for scenario in choices], 'scenario')
-    chosen_scenario = choices[index]
+    # Only the chosen scenario is imported
+    chosen_scenario = choices[index].load()
+
+    if args['kali_pool']:
+        from container.kali import Kali, kali_pool
+        Kali.pool = kali_pool(args['kali_pool'])
+        Kali.pool.fill()
 
-    # Take in student ID
+    # Take in student ID, it names the student's files and document server account
+    from utils import docserver
     seed = raw_input("Enter your ID: ")
+    while not docserver.valid_username(seed):
+        print("*** IDs can only contain letters, digits, '_' and '-'.")
+        seed = raw_input("Enter your ID: ")
     # Create a scenario with ID as seed
     scenario = chosen_scenario(teacher=False, developer=args['developer'], seed=seed)
-    # Execute scenario
-    scenario.run()
-    # Reseed the random number generator so the password stays the FTP same between tasks
-    random.seed(seed)
-    # Host task on FTP
-    scenario.run_ftp()
+    # Closing the SSH session sends SIGHUP, exit so the network is still removed
+    signal.signal(signal.SIGHUP, lambda signum, frame: sys.exit(1))
+    try:
+        # Execute scenario
+        scenario.run()
+        if args['kali_pool']:
+            print("*** Kali pool: %(idle)d idle, %(hits)d/%(claims)d claims were hits" % Kali.pool.stats())
+        # Publish the task on the VM's document server
+        scenario.publish_documents()
+        raw_input("Keep this terminal open until you've finished the task, press enter to stop the scenario.")
+    finally:
+        # Only this scenario's network is removed, other students' scenarios keep running
+        scenario.stop()
 
 
 def batch_scenario(args):
@@ -219,25 +302,68 @@ def batch_scenario(args):
     chosen_scenario = choices[index]
 
     # Take in student IDs
-    seed = raw_input("Enter Student IDs seperated by spaces: ").split(" ")
-    # Create and execute scenarios for each ID
-    scenario = None
-    for s in seed:
-        scenario = chosen_scenario(teacher=True, developer=args['developer'], seed=s)
-        scenario.run()
-    # Reseed to a set value
-    random.seed("")
-    # Host answers for all generated scenarios on ftp
-    scenario.run_ftp()
+    from utils import docserver
+    seed = raw_input("Enter Student IDs seperated by spaces: ").split()
+    for s in [s for s in seed if not docserver.valid_username(s)]:
+        print("*** Skipping ID %r, IDs can only contain letters, digits, '_' and '-'." % s)
+    seed = [s for s in seed if docserver.valid_username(s)]
+    # Create and execute scenarios for each ID, each in its own worker process
+    jobs = [(chosen_scenario.module, s) for s in seed]
+    if args['answer_book']:
+        path = os.path.join('./teacher/', '%s answers.%s' % (chosen_scenario.name, args['answer_book']))
+        with AnswerBook(path, seed, chosen_scenario.name) as book:
+            run_batch(jobs, workers=args['workers'], dry_run=args['dry_run'], book=book)
+    else:
+        run_batch(jobs, workers=args['workers'], dry_run=args['dry_run'])
+    # Publish answers for all generated scenarios on the VM's document server
+    chosen_scenario.load()(teacher=True, developer=args['developer']).publish_documents()
+
 
+def document_server(args):
+    """
+    Starts the document server if it isn't running and prints its connection and transfer counts.
+    Lists the registered accounts and removes any the user chooses, along with their documents.
 
-def cleanup():
+    :param args: Arguments from the 'get_args' function in this module.
+    """
+    from utils import docserver
+    print("*** Document server %s" % ("running" if docserver.ensure_running() else "failed to start"))
+    for name, count in sorted(docserver.metrics().items()):
+        print("%s: %d" % (name, count))
+    users = docserver.users()
+    print("*** %d accounts: %s" % (len(users), ' '.join(users)))
+    for username in raw_input("Enter accounts to remove seperated by spaces, or nothing to keep them: ").split():
+        if username not in users:
+            print("*** Skipping %r, there's no such account." % username)
+            continue
+        docserver.unregister(username)
+        print("*** Removed %s" % username)
+
+
+def cleanup(args):
     """
         Clean all docker systems to reduce VM size
+
+    :param args: Arguments from the 'get_args' function in this module.
     """
     os.system("docker system prune -a --volumes")
 
 
+def global_cleanup(args):
+    """
+    Removes every Mininet switch, link, container and controller on the VM, including those of running scenarios.
+    Scenarios clean up after themselves, this is only needed after a crash left resources behind.
+
+    :param args: Arguments from the 'get_args' function in this module.
+    """
+    if raw_input("This stops every running scenario, continue? [y/N] ").lower() != 'y':
+        return
+    from mininet.clean import cleanup as mininet_cleanup
+    # Registers the cleanup of POX controllers
+    import scenarios
+    mininet_cleanup()
+
+
 def main():
     """Run if we're the main file"""
 
@@ -249,6 +375,11 @@ def main():
     if args['developer']:
         options.append(("Test All Scenarios", test_scenarios))
         options.append(("Container Examples", containers))
+        options.append(("Build All Containers", build_containers))
+        options.append(("Fill Kali Pool", fill_kali_pool))
+        options.append(("Kali Package Report", package_report))
+        options.append(("Document Server", document_server))
+        options.append(("Global Cleanup", global_cleanup))
     # Give single task options to students
     if not args['teacher']:
         options.append(("Scenarios", run_scenario))
@@ -256,6 +387,7 @@ def main():
     else:
         options.append(("Scenarios", batch_scenario))
     options.append(("Clean space", cleanup))
+    print("*** Ready in %.2fs" % (time.time() - started))
     # Print choices
     for i in range(0, len(options)):
         print("[%s] %s" % (i, options[i][0]))
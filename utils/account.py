@@ -5,6 +5,8 @@ Host Account Management
 import random
 from mininet.node import Docker
 
+from utils.session import current
+
 
 def add_user(host, username, password=None):
     # type: (Docker, str, str) -> None
@@ -21,7 +23,7 @@ def change_password(host, username, password):
     host.cmd("echo '%s:%s' | chpasswd" % (username, password))
 
 
-def generate_password(length=20):
-    # type: (int) -> str
-    """Generates a password containing hexadecimal characters (0-9 & a-f)"""
-    return ('%0'+str(length)+'x') % random.randrange(16 ** length)
+def generate_password(length=20, rng=None):
+    # type: (int, random.Random) -> str
+    """Generates a password containing hexadecimal characters (0-9 & a-f), using 'rng' or the current session's random number generator."""
+    return ('%0'+str(length)+'x') % (rng or current().random).randrange(16 ** length)
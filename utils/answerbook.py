@@ -0,0 +1,172 @@
+"""
+Answer Book
+===========
+
+Collects the answers of every student in a batch into a single file, instead of an answer sheet per student.
+Answers are written as each seed finishes and then dropped, so memory use doesn't grow with the size of the class.
+
+Three formats are written, chosen by the file's extension:
+
+- .docx, a document with an index of student IDs at the start, each linking to the student's answers.
+- .csv, a row per question.
+- .jsonl, a line per student.
+
+CSV and JSON Lines books are written with an index file ('[book].index') holding the byte offset of each student's
+answers, `lookup` uses it to read one student's answers without reading the whole book.
+"""
+
+import csv
+import json
+import os
+
+from typing import Any, List, Optional, Tuple
+
+from utils.sheet import Sheet, Template, ZipStream
+
+FORMATS = ('docx', 'csv', 'jsonl')
+
+
+class AnswerBook(object):
+
+    def __init__(self, path, seeds, scenario):
+        # type: (str, List[str], str) -> None
+        """
+        Starts an answer book.
+
+        Example:
+            >>> with AnswerBook('teacher/Host Scanning answers.docx', ['1001', '1002'], 'Host Scanning') as book:
+            ...     book.add('1002', [('What is the Network Address of this network', '10.197.62.0')])
+            ...     book.add('1001', [], error='Traceback ...')
+
+        :param path: File to write, its extension chooses the format
+        :param seeds: Student IDs in the batch, listed in the index of a .docx book
+        :param scenario: Scenario name, used as the book's title
+        """
+        self.path = path
+        self.format = os.path.splitext(path)[1].lstrip('.').lower()
+        if self.format not in FORMATS:
+            raise ValueError('Answer books can be %s, not %r' % (', '.join(FORMATS), self.format))
+        self.scenario = scenario
+        # Bookmarks can only be letters, digits and underscores, so they're numbered in the order of the index
+        self.anchors = dict((seed, 'student_%d' % i) for i, seed in enumerate(sorted(set(seeds))))
+        self.added = set()
+        self.file = open(path, 'wb' if self.format == 'docx' else 'w')
+        if self.format == 'docx':
+            self._start_docx()
+        else:
+            self.index = open(path + '.index', 'w')
+            if self.format == 'csv':
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(['student_id', 'scenario', 'number', 'question', 'answer', 'error'])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start_docx(self):
+        # type: () -> None
+        """Writes the template and the start of the body, up to the end of the index."""
+        template = Template.default()
+        self.archive = ZipStream(self.file)
+        for info, data in template.entries:
+            if info.filename != 'word/document.xml':
+                self.archive.copy(info, data)
+        # The body goes last, so it can be written as answers arrive
+        self.body = self.archive.open('word/document.xml')
+        self.body.write(template.head)
+        # A single sheet builds every block, keeping the bookmark IDs unique
+        self.sheet = Sheet(template)
+        self.sheet.add_heading('%s answers' % self.scenario, level=1)
+        self.sheet.add_heading('Index', level=2)
+        for seed in sorted(self.anchors):
+            self.sheet.add_paragraph().add_hyperlink(None, seed, anchor=self.anchors[seed])
+        self._flush()
+
+    def _flush(self):
+        # type: () -> None
+        """Writes the sheet's blocks to the body and forgets them."""
+        for block in self.sheet.blocks:
+            self.body.write(block.xml())
+        del self.sheet.blocks[:]
+
+    def add(self, seed, questions, error=None):
+        # type: (str, List[Tuple[str, str]], str) -> None
+        """
+        Adds a student's answers to the book.
+
+        :param seed: The student's ID
+        :param questions: The question and answer pairs of the student's scenario, see `Scenario.questions`
+        :param error: Why the student's scenario failed, if it did
+        """
+        self.added.add(seed)
+        # Statements without an answer aren't in answer sheets either
+        answers = [(number + 1, question, answer) for number, (question, answer) in enumerate(questions) if answer != ""]
+        if self.format == 'docx':
+            self.sheet.add_page_break()
+            heading = self.sheet.add_heading('Student %s' % seed, level=2)
+            if seed in self.anchors:
+                heading.add_bookmark(self.anchors[seed])
+            if error:
+                self.sheet.add_paragraph('Not generated: %s' % error.strip().splitlines()[-1])
+            for number, question, answer in answers:
+                self.sheet.add_paragraph('%d. %s: ' % (number, question)).add_run(answer).bold = True
+            self._flush()
+            return
+        self.file.flush()
+        start = self.file.tell()
+        if self.format == 'csv':
+            if error:
+                self.writer.writerow([seed, self.scenario, '', '', '', error.strip().splitlines()[-1]])
+            for number, question, answer in answers:
+                self.writer.writerow([seed, self.scenario, number, question, answer, ''])
+        else:
+            self.file.write(json.dumps({'student_id': seed,
+                                        'scenario': self.scenario,
+                                        'answers': [{'number': number, 'question': question, 'answer': answer}
+                                                    for number, question, answer in answers],
+                                        'error': error}) + '\n')
+        self.file.flush()
+        self.index.write('%s\t%d\t%d\n' % (seed, start, self.file.tell() - start))
+
+    def close(self):
+        # type: () -> None
+        """Completes the book. Students in the index that were never added are listed as not generated."""
+        if self.file.closed:
+            return
+        if self.format == 'docx':
+            for seed in sorted(set(self.anchors) - self.added):
+                self.add(seed, [], error='Not generated')
+            self.body.write(self.sheet.template.tail)
+            self.body.close()
+            self.archive.close()
+        else:
+            self.index.close()
+        self.file.close()
+
+
+def lookup(path, seed):
+    # type: (str, str) -> Optional[Any]
+    """
+    Reads one student's answers from a .csv or .jsonl book using its index.
+
+    Example:
+        >>> lookup('teacher/Host Scanning answers.jsonl', '1002')['answers'][0]['answer']
+        '10.197.62.0'
+
+    :return: The CSV rows, or the JSON object, of the student. None if the student isn't in the book.
+    """
+    with open(path + '.index') as index:
+        for line in index:
+            student, start, length = line.rstrip('\n').split('\t')
+            if student == seed:
+                break
+        else:
+            return None
+    with open(path, 'rb') as f:
+        f.seek(int(start))
+        data = f.read(int(length)).decode('utf-8')
+    if path.endswith('.csv'):
+        return list(csv.reader(data.splitlines()))
+    return json.loads(data)
@@ -0,0 +1,174 @@
+"""
+Batch Generation
+================
+
+Runs a scenario for many seeds (student IDs) across a pool of worker processes.
+Each seed is run in a fresh process, so it gets its own random number generator and module state,
+and writes its documents to a private staging folder before they're moved into place.
+A failing seed is recorded and reported at the end instead of stopping the batch.
+"""
+
+import importlib
+import os
+import shutil
+import tempfile
+import time
+import traceback
+from multiprocessing import Pool
+
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.answerbook import AnswerBook
+
+STAGING_DIRECTORY = '.dvni-staging'
+"""Folder beside the teacher folder that seeds write their documents to, outside of what the document server shares."""
+
+
+class Result(object):
+
+    def __init__(self, module, seed, elapsed, error=None, timings=None, questions=None):
+        # type: (str, str, float, str, Dict[str, float], List[Tuple[str, str]]) -> None
+        """
+        The outcome of running a scenario for a single seed.
+
+        :param module: Scenario module name, e.g. 'HostScanning'
+        :param seed: The seed the scenario was run with
+        :param elapsed: Seconds taken to run the seed
+        :param error: Formatted traceback if the seed failed, otherwise None
+        :param timings: Seconds taken by each phase of the scenario, see `Scenario.timings`
+        :param questions: The scenario's questions and answers, see `Scenario.questions`
+        """
+        self.module = module
+        self.seed = seed
+        self.elapsed = elapsed
+        self.error = error
+        self.timings = timings or {}
+        self.questions = questions
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _makedirs(directory):
+    # type: (str) -> None
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Another worker created it first
+            pass
+
+
+def _publish(source, destination):
+    # type: (str, str) -> None
+    """Moves every file in the source folder into the destination folder, replacing existing files."""
+    if not os.path.isdir(source):
+        return
+    _makedirs(destination)
+    for filename in os.listdir(source):
+        # Renaming is atomic, so workers writing the same task sheet can't corrupt it
+        os.rename(os.path.join(source, filename), os.path.join(destination, filename))
+
+
+def _run_seed(job):
+    # type: (Tuple[str, str, bool, bool, str, str, bool]) -> Result
+    """
+    Worker function, runs a scenario for one seed and publishes its documents.
+    Any exception is caught and returned as part of the result.
+    """
+    module, seed, teacher, dry_run, student_directory, teacher_directory, answer_sheets = job
+    started = time.time()
+    scenario = None
+    # Stage documents beside the teacher folder, on the same filesystem so they can be renamed into place,
+    # but not in it, as the teacher's document server account would show half-written seeds
+    staging_root = os.path.join(os.path.dirname(os.path.abspath(teacher_directory)), STAGING_DIRECTORY)
+    _makedirs(staging_root)
+    staging = tempfile.mkdtemp(prefix='batch-', dir=staging_root)
+    error = None
+    try:
+        scenario = importlib.import_module("scenarios.%s" % module).Import(teacher=teacher, seed=seed, dry_run=dry_run)
+        scenario.student_directory = os.path.join(staging, 'student', '')
+        scenario.teacher_directory = os.path.join(staging, 'teacher', '')
+        scenario.run()
+        if not answer_sheets:
+            # The answers go in the batch's answer book instead
+            os.remove(os.path.join(scenario.teacher_directory, '%s-%s.docx' % (scenario.name, scenario.seed)))
+        _publish(scenario.student_directory, student_directory)
+        _publish(scenario.teacher_directory, teacher_directory)
+    except Exception:
+        error = traceback.format_exc()
+    # Only the documents are needed, so the network is stopped once they're written
+    if scenario is not None:
+        try:
+            scenario.stop()
+        except Exception:
+            if error is None:
+                error = traceback.format_exc()
+    shutil.rmtree(staging, ignore_errors=True)
+    return Result(module, seed, time.time() - started, error, scenario.timings if scenario is not None else None,
+                  scenario.questions if scenario is not None else None)
+
+
+def run_batch(jobs, workers=1, teacher=True, dry_run=False, student_directory='./student/', teacher_directory='./teacher/',
+              book=None):
+    # type: (List[Tuple[str, str]], int, bool, bool, str, str, AnswerBook) -> List[Result]
+    """
+    Runs each (scenario module, seed) pair in a pool of worker processes, printing progress as seeds finish.
+
+    Example:
+        >>> results = run_batch([('HostScanning', s) for s in ['1001', '1002']], workers=2)
+        *** [1/2] HostScanning 1002 done in 31.2s (1.9 seeds/min)
+        *** [2/2] HostScanning 1001 done in 32.0s (3.7 seeds/min)
+        *** Batch finished: 2/2 seeds succeeded in 32.4s (3.7 seeds/min)
+
+    :param jobs: List of (scenario module, seed) pairs to run.
+    :param workers: Maximum number of seeds to run at the same time.
+    :param teacher: Passed to the scenario, should be true when generating answer sheets.
+    :param dry_run: Passed to the scenario, generates the documents without starting a network.
+    :param student_directory: Folder that task sheets are published to.
+    :param teacher_directory: Folder that answer sheets are published to.
+    :param book: Answer book each seed's answers are written to as it finishes, instead of an answer sheet per seed.
+        Answers are dropped from the results once written.
+    :return: A result for every job, in the order they finished.
+    """
+    started = time.time()
+    results = []
+    # A new process for every seed keeps each seed's random state and module globals separate
+    pool = Pool(processes=max(1, workers), maxtasksperchild=1)
+    try:
+        for result in pool.imap_unordered(_run_seed, [(module, seed, teacher, dry_run, student_directory, teacher_directory,
+                                                       book is None) for module, seed in jobs]):
+            if book is not None:
+                book.add(result.seed, result.questions or [], result.error)
+                result.questions = None
+            results.append(result)
+            print("*** [%d/%d] %s %s %s in %.1fs (%.1f seeds/min)" % (
+                len(results), len(jobs), result.module, result.seed,
+                "done" if result.ok else "FAILED", result.elapsed, _throughput(len(results), started)))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    summarise(results, time.time() - started)
+    return results
+
+
+def _throughput(count, started):
+    # type: (int, float) -> float
+    """Seeds completed per minute since 'started'."""
+    return count * 60.0 / max(time.time() - started, 0.001)
+
+
+def summarise(results, elapsed):
+    # type: (List[Result], float) -> None
+    """Prints the overall throughput and the error for each failed seed."""
+    failed = [r for r in results if not r.ok]
+    print("*** Batch finished: %d/%d seeds succeeded in %.1fs (%.1f seeds/min)" % (
+        len(results) - len(failed), len(results), elapsed, len(results) * 60.0 / max(elapsed, 0.001)))
+    for result in failed:
+        # The last line of the traceback holds the exception message
+        print("*** %s %s failed: %s" % (result.module, result.seed, result.error.strip().splitlines()[-1]))
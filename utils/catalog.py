@@ -0,0 +1,140 @@
+"""
+Scenario Catalog
+================
+
+Lists the scenarios in a directory without importing them.
+Importing a scenario pulls in Mininet, Docker, python-docx and friends, so the menu is built by reading
+the `name`, `enabled`, `weight` and `packages` attributes of each `Import` class straight from the source code.
+Only the scenario that is chosen is ever imported.
+"""
+
+import ast
+import importlib
+import os
+import sys
+
+from typing import Dict, List, Optional, Tuple
+
+ATTRIBUTES = ('name', 'enabled', 'weight', 'packages')
+"""Class attributes read from each scenario's `Import` class."""
+
+
+class Entry(object):
+
+    def __init__(self, module, name, enabled, weight, packages=None):
+        # type: (str, str, bool, int, List[str]) -> None
+        """
+        A scenario found in the catalog, it can be listed without being imported.
+
+        :param module: Module name within the scenarios package, e.g. 'HostScanning'
+        :param name: The scenario's `name` attribute
+        :param enabled: The scenario's `enabled` attribute
+        :param weight: The scenario's `weight` attribute
+        :param packages: The scenario's `packages` attribute
+        """
+        self.module = module
+        self.name = name
+        self.enabled = enabled
+        self.weight = weight
+        self.packages = packages or []
+
+    def load(self):
+        """
+        Imports the scenario module and returns its `Import` class.
+
+        :rtype: Type[Scenario]
+        """
+        return importlib.import_module("scenarios.%s" % self.module).Import
+
+    def __repr__(self):
+        return "Entry(%r, name=%r, enabled=%r, weight=%r)" % (self.module, self.name, self.enabled, self.weight)
+
+
+def _parse(path):
+    # type: (str) -> Dict[str, Tuple[List[ast.expr], Dict[str, object]]]
+    """
+    Reads the classes defined at the top level of a file.
+
+    :return: Dictionary of class name to a tuple of its base expressions and literal class attributes.
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    classes = {}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        attributes = {}
+        for statement in node.body:
+            # Only simple "attribute = literal" assignments are read
+            if not isinstance(statement, ast.Assign) or len(statement.targets) != 1:
+                continue
+            target = statement.targets[0]
+            if not isinstance(target, ast.Name) or target.id not in ATTRIBUTES:
+                continue
+            try:
+                attributes[target.id] = ast.literal_eval(statement.value)
+            except ValueError:
+                # Not a literal, it can't be known without running the module
+                pass
+        classes[node.name] = (node.bases, attributes)
+    return classes
+
+
+def _lookup(modules, module, cls, attribute):
+    # type: (Dict[str, Dict], str, str, str) -> Optional[object]
+    """Finds an attribute of a class, following its base classes through the parsed modules."""
+    classes = modules.get(module, {})
+    if cls not in classes:
+        # Classes imported with "from scenarios import Scenario" live in __init__
+        classes = modules.get('__init__', {})
+        module = '__init__'
+        if cls not in classes:
+            return None
+    bases, attributes = classes[cls]
+    if attribute in attributes:
+        return attributes[attribute]
+    for base in bases:
+        # Scenario
+        if isinstance(base, ast.Name):
+            value = _lookup(modules, module, base.id, attribute)
+        # PacketSniffing.Import
+        elif isinstance(base, ast.Attribute) and isinstance(base.value, ast.Name):
+            value = _lookup(modules, base.value.id, base.attr, attribute)
+        else:
+            continue
+        if value is not None:
+            return value
+    return None
+
+
+def catalog(directory):
+    # type: (str) -> List[Entry]
+    """
+    Reads every scenario in the given directory, including disabled ones.
+
+    Example:
+        >>> catalog('/vagrant/scenarios/')[0]
+        Entry('ArpPoisoning', name='ARP Poisoning', enabled=True, weight=40)
+
+    :param directory: Directory to look for scenarios in, usually '$ProjectRoot/scenarios/'
+    :return: List of entries in file name order.
+    """
+    modules = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename[-3:] == ".py":
+            modules[filename[:-3]] = _parse(os.path.join(directory, filename))
+
+    entries = []
+    for module in sorted(modules):
+        # Internal modules such as __init__ and __template__ aren't scenarios
+        if module[:2] == "__" or 'Import' not in modules[module]:
+            continue
+        name = _lookup(modules, module, 'Import', 'name')
+        enabled = _lookup(modules, module, 'Import', 'enabled')
+        weight = _lookup(modules, module, 'Import', 'weight')
+        entries.append(Entry(module,
+                             name if name is not None else module,
+                             bool(enabled),
+                             weight if weight is not None else sys.maxsize,
+                             _lookup(modules, module, 'Import', 'packages')))
+    return entries
@@ -0,0 +1,83 @@
+"""
+Scoped Cleanup
+==============
+
+Removes what a single network created, leaving every other network on the VM running.
+`mininet.clean.cleanup` removes every Mininet bridge, link, container and controller on the machine,
+so it's only used as an explicit admin action.
+"""
+
+import docker
+from mininet.log import debug, info
+from mininet.node import Controller, OVSSwitch
+from mininet.util import errRun
+from typing import Any, List
+
+
+def _run(*cmd):
+    # type: (*str) -> bool
+    """Runs a command without a shell, so a pattern given to pkill can't match the shell itself. True if it exited with 0."""
+    return errRun(list(cmd))[2] == 0
+
+
+def cleanup_network(net):
+    # type: (Any) -> List[str]
+    """
+    Removes the containers, switches, links, controller processes and host namespaces of a network.
+    Safe to call after the network has been stopped, or when it failed part way through starting;
+    anything already removed is skipped.
+
+    :param net: A Containernet network
+    :return: Names of the resources that were still present and have been removed.
+    """
+    removed = []
+
+    for host in net.hosts:
+        # Containernet names containers 'mn.[name]'
+        if hasattr(host, 'dcli') and getattr(host, 'dc', None) is not None:
+            # Already returned to its pool when the network stopped
+            if getattr(host.dcli, 'released', False):
+                continue
+            try:
+                # Containernet removes containers when the network stops, only remove those left behind
+                host.dcli.inspect_container(host.dc)
+            except docker.errors.NotFound:
+                continue
+            except docker.errors.APIError as e:
+                debug('*** Could not inspect container mn.%s: %s\n' % (host.name, e))
+                continue
+            try:
+                # The node's own client, so a pooled container is returned to its pool rather than removed
+                host.dcli.remove_container(host.dc, force=True)
+                removed.append('mn.' + host.name)
+            except docker.errors.NotFound:
+                pass
+            except docker.errors.APIError as e:
+                debug('*** Could not remove container mn.%s: %s\n' % (host.name, e))
+
+    for switch in net.switches:
+        if isinstance(switch, OVSSwitch) and _run('ovs-vsctl', 'br-exists', switch.name):
+            _run('ovs-vsctl', '--if-exists', 'del-br', switch.name)
+            removed.append(switch.name)
+
+    # Link interfaces left in the root namespace, e.g. the switch end of a link once its bridge is gone
+    for link in net.links:
+        for intf in (link.intf1, link.intf2):
+            if _run('ip', 'link', 'show', intf.name):
+                _run('ip', 'link', 'del', intf.name)
+                removed.append(intf.name)
+
+    for controller in net.controllers:
+        if isinstance(controller, Controller) and controller.command:
+            # The command line the controller was started with, as in Controller.start
+            if _run('pkill', '-9', '-f', controller.command + ' ' + controller.cargs % controller.port):
+                removed.append(controller.name)
+
+    # Each node's shell holds its namespaces open, they go once the shell is killed
+    for node in net.hosts + net.switches + net.controllers:
+        if _run('pkill', '-9', '-f', 'mininet:%s$' % node.name):
+            removed.append('mininet:' + node.name)
+
+    if removed:
+        info('*** Removed leftover resources: %s\n' % ' '.join(removed))
+    return removed
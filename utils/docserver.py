@@ -0,0 +1,352 @@
+"""
+Document Server
+===============
+
+A single FTP server for the VM that every scenario publishes its task and answer sheets to.
+It runs detached from any student's session, so sheets stay available after a scenario has stopped
+and a whole class can download them at the same time.
+
+Scenarios register a user by writing a file to the spool directory, each user has its own home directory
+holding copies of their documents. The server reads the spool when a user logs in, so users are added and removed
+without restarting it. Accounts stay until removed with `unregister`, from the Document Server menu option. Files are sent with sendfile(), and connections are handled by a fixed number of
+pre-forked worker processes. Each worker writes its connection and transfer counts to the metrics directory,
+`metrics` adds them up.
+
+Run in the foreground with `python -m utils.docserver`.
+"""
+
+import errno
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import socket
+import string
+import subprocess
+import sys
+import time
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.servers import FTPServer
+from typing import Dict, List
+
+DOCUMENT_ROOT = '/var/lib/dvni'
+"""Directory holding everything the server uses."""
+
+SPOOL_DIRECTORY = os.path.join(DOCUMENT_ROOT, 'spool')
+"""A JSON file per registered user, named '[username].json'."""
+
+HOME_DIRECTORY = os.path.join(DOCUMENT_ROOT, 'homes')
+"""A home directory per registered user, holding their documents."""
+
+METRICS_DIRECTORY = os.path.join(DOCUMENT_ROOT, 'metrics')
+"""A JSON file of counts per worker process, named '[pid].json'."""
+
+PID_FILE = os.path.join(DOCUMENT_ROOT, 'docserver.pid')
+
+PORT = 21
+
+WORKERS = 4
+"""Worker processes, each handles many connections so this doesn't limit how many users can download at once."""
+
+MAX_CONNECTIONS = 256
+MAX_CONNECTIONS_PER_IP = 5
+
+METRICS_INTERVAL = 1.0
+"""Minimum seconds between a worker writing its metrics."""
+
+PASSWORD_LENGTH = 12
+
+USERNAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+\Z')
+"""Usernames are student IDs typed in by students, and name files and directories, so only these are allowed."""
+
+
+def _makedirs(directory):
+    # type: (str) -> None
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _write_json(path, data):
+    # type: (str, Dict) -> None
+    """Writes to a temporary file then renames it, so the server never reads half a file."""
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    # Only readable by root, entries hold passwords
+    with os.fdopen(os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+        json.dump(data, f)
+    os.rename(temporary, path)
+
+
+def valid_username(username):
+    # type: (str) -> bool
+    return USERNAME_PATTERN.match(username) is not None
+
+
+def _home(username):
+    # type: (str) -> str
+    """
+    The home directory of a user, checked to be inside `HOME_DIRECTORY` before anything in it is removed.
+
+    :raises ValueError: If the username isn't valid.
+    """
+    if not valid_username(username):
+        raise ValueError('Invalid document server username %r, only letters, digits, _ and - are allowed' % username)
+    home = os.path.realpath(os.path.join(HOME_DIRECTORY, username))
+    if os.path.dirname(home) != os.path.realpath(HOME_DIRECTORY):
+        raise ValueError('Home directory of %r is outside of %s' % (username, HOME_DIRECTORY))
+    return home
+
+
+def new_password(length=PASSWORD_LENGTH):
+    # type: (int) -> str
+    """
+    Makes a password from the system's random source, so it can't be guessed from a student ID or seed.
+
+    Example:
+        >>> new_password()
+        'q7WmZc3kR9xd'
+    """
+    rng = random.SystemRandom()
+    return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+
+def register(username, password, files=None, homedir=None, perm='elr'):
+    # type: (str, str, List[str], str, str) -> str
+    """
+    Adds a user to the document server, replacing any user with the same name.
+
+    Example:
+        >>> register('1001', 'a3f9c', ['./student/Host Scanning.docx'])
+        '/var/lib/dvni/homes/1001'
+
+    :param username: Name the user logs in with
+    :param password: The user's password
+    :param files: Documents copied to the user's own home directory.
+        Copied rather than linked, as the same path is saved to again by the next scenario.
+    :param homedir: Directory to give the user instead, used as is, e.g. the teacher's directory of every answer sheet
+    :param perm: pyftpdlib permissions, read only by default
+    :return: The user's home directory
+    :raises ValueError: If the username isn't letters, digits, _ and -.
+    """
+    if not valid_username(username):
+        raise ValueError('Invalid document server username %r, only letters, digits, _ and - are allowed' % username)
+    if homedir is None:
+        homedir = _home(username)
+        if os.path.exists(homedir):
+            shutil.rmtree(homedir)
+        _makedirs(homedir)
+        for path in files or []:
+            shutil.copy2(path, homedir)
+    _makedirs(SPOOL_DIRECTORY)
+    _write_json(os.path.join(SPOOL_DIRECTORY, username + '.json'),
+                {'username': username,
+                 'password': password,
+                 'homedir': os.path.abspath(homedir),
+                 'perm': perm})
+    return homedir
+
+
+def users():
+    # type: () -> List[str]
+    """Lists the registered usernames."""
+    if not os.path.isdir(SPOOL_DIRECTORY):
+        return []
+    return sorted(filename[:-len('.json')] for filename in os.listdir(SPOOL_DIRECTORY) if filename.endswith('.json'))
+
+
+def unregister(username):
+    # type: (str) -> None
+    """
+    Removes a user and their home directory.
+
+    :raises ValueError: If the username isn't letters, digits, _ and -.
+    """
+    home = _home(username)
+    try:
+        os.remove(os.path.join(SPOOL_DIRECTORY, username + '.json'))
+    except OSError:
+        pass
+    shutil.rmtree(home, ignore_errors=True)
+
+
+class SpoolAuthorizer(DummyAuthorizer):
+    """Authorizer whose users are the entries of the spool directory, re-read at every login."""
+
+    def __init__(self, spool=None):
+        DummyAuthorizer.__init__(self)
+        self.spool = spool or SPOOL_DIRECTORY
+
+    def refresh(self):
+        # type: () -> None
+        """
+        Reads the spool, so users registered or removed since the last login are seen.
+        It's read in full each time, as it's a few small files, rather than trusting the directory's modification time,
+        which two registrations in the same tick of the filesystem's clock leave unchanged.
+        """
+        _makedirs(self.spool)
+        self.user_table = {}
+        for filename in os.listdir(self.spool):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.spool, filename)) as f:
+                    user = json.load(f)
+                self.add_user(str(user['username']), str(user['password']), str(user['homedir']),
+                              perm=str(user['perm']))
+            except (IOError, OSError, ValueError, KeyError) as e:
+                # e.g. the home directory has been removed, skip the user rather than every user
+                logging.warning('Skipping document server user %s: %s', filename, e)
+
+    def validate_authentication(self, username, password, handler):
+        self.refresh()
+        return DummyAuthorizer.validate_authentication(self, username, password, handler)
+
+
+class Metrics(object):
+
+    def __init__(self, directory=None):
+        """Connection and transfer counts of a worker process, written to '[directory]/[pid].json'."""
+        self.directory = directory or METRICS_DIRECTORY
+        self.counts = {'connections': 0,
+                       'active': 0,
+                       'logins': 0,
+                       'failed_logins': 0,
+                       'files_sent': 0,
+                       'incomplete_sends': 0,
+                       'bytes_sent': 0}
+        self.written = 0.0
+
+    def add(self, name, amount=1):
+        # type: (str, int) -> None
+        self.counts[name] += amount
+        if time.time() - self.written >= METRICS_INTERVAL or name == 'active':
+            self.write()
+
+    def write(self):
+        # type: () -> None
+        self.written = time.time()
+        _makedirs(self.directory)
+        _write_json(os.path.join(self.directory, '%d.json' % os.getpid()), self.counts)
+
+
+def metrics(directory=None):
+    # type: (str) -> Dict[str, int]
+    """
+    Adds up the counts of every worker process that has served a connection.
+
+    Example:
+        >>> metrics()
+        {'connections': 31, 'active': 2, 'logins': 30, 'failed_logins': 1, 'files_sent': 58, 'incomplete_sends': 0, 'bytes_sent': 2214400}
+    """
+    directory = directory or METRICS_DIRECTORY
+    total = {}  # type: Dict[str, int]
+    if not os.path.isdir(directory):
+        return total
+    for filename in os.listdir(directory):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as f:
+                for name, count in json.load(f).items():
+                    total[name] = total.get(name, 0) + count
+    return total
+
+
+class DocumentHandler(FTPHandler):
+    """FTP handler that records metrics, files are sent with sendfile() where the platform has it."""
+
+    banner = "DVNG tasks ftp server"
+    metrics = None  # type: Metrics
+
+    def on_connect(self):
+        self.metrics.add('connections')
+        self.metrics.add('active')
+
+    def on_disconnect(self):
+        self.metrics.add('active', -1)
+
+    def on_login(self, username):
+        self.metrics.add('logins')
+
+    def on_login_failed(self, username, password):
+        self.metrics.add('failed_logins')
+
+    def on_file_sent(self, file):
+        self.metrics.add('files_sent')
+        self.metrics.add('bytes_sent', os.path.getsize(file))
+
+    def on_incomplete_file_sent(self, file):
+        self.metrics.add('incomplete_sends')
+
+
+def serve(port=PORT, workers=WORKERS):
+    # type: (int, int) -> None
+    """
+    Runs the document server in the foreground until it's stopped.
+
+    :param port: Port to listen on
+    :param workers: Number of pre-forked worker processes
+    """
+    for directory in [SPOOL_DIRECTORY, HOME_DIRECTORY, METRICS_DIRECTORY]:
+        _makedirs(directory)
+    # Counts from a previous server would be added to this one's
+    for filename in os.listdir(METRICS_DIRECTORY):
+        os.remove(os.path.join(METRICS_DIRECTORY, filename))
+    DocumentHandler.authorizer = SpoolAuthorizer()
+    DocumentHandler.metrics = Metrics()
+    logging.basicConfig(level=logging.WARNING)
+    server = FTPServer(('', port), DocumentHandler)
+    server.max_cons = MAX_CONNECTIONS
+    server.max_cons_per_ip = MAX_CONNECTIONS_PER_IP
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    logging.warning('Document server listening on port %d with %d workers, sendfile %s',
+                    port, workers, 'enabled' if DocumentHandler.use_sendfile else 'unavailable')
+    server.serve_forever(worker_processes=workers)
+
+
+def running(port=PORT):
+    # type: (int) -> bool
+    """Checks if the document server is accepting connections."""
+    try:
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+        return True
+    except socket.error:
+        return False
+
+
+def ensure_running(port=PORT, workers=WORKERS, timeout=10):
+    # type: (int, int, float) -> bool
+    """
+    Starts the document server in the background if it isn't running.
+    The server is detached from the calling process, so it keeps running once the session that started it ends.
+
+    :param port: Port to listen on
+    :param workers: Number of pre-forked worker processes
+    :param timeout: Seconds to wait for the server to accept connections
+    :return: If the server is running.
+    """
+    if running(port):
+        return True
+    _makedirs(DOCUMENT_ROOT)
+    with open(os.devnull, 'r+') as devnull, open(os.path.join(DOCUMENT_ROOT, 'docserver.log'), 'a') as log:
+        subprocess.Popen([sys.executable, '-m', 'utils.docserver', str(port), str(workers)],
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         stdin=devnull, stdout=log, stderr=log,
+                         close_fds=True,
+                         # A new session, so closing the terminal doesn't send the server SIGHUP
+                         preexec_fn=os.setsid)
+    started = time.time()
+    while time.time() - started < timeout:
+        if running(port):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+if __name__ == "__main__":
+    serve(*[int(arg) for arg in sys.argv[1:3]])
@@ -6,24 +6,27 @@ Documenation
 
 import os
 import uuid
-from docx import Document
-from container import Docker
-from utils import subnet
+from utils.session import current
+from utils.sheet import Sheet
 import networkx as nx
 import matplotlib.pyplot as plt
 
 
-def docker_hosts(net, doc=Document()):
+def docker_hosts(net, doc=None):
+    if doc is None:
+        doc = Sheet()
     # If there are Docker instances
     # TODO: this could just find net.hosts that are instances of docker
-    if Docker.added:
+    if current().added:
         doc.add_heading('Docker Hosts', level=1)
-        for host in Docker.added:
+        for host in current().added:
             host.document(doc)
     return doc
 
 
-def all_hosts(net, doc=Document()):
+def all_hosts(net, doc=None):
+    if doc is None:
+        doc = Sheet()
     # If there are Hosts
     if net.hosts:
         doc.add_heading('Address list', level=2)
@@ -36,16 +39,18 @@ def all_hosts(net, doc=Document()):
     return doc
 
 
-def subnet_table(net, doc=Document()):
+def subnet_table(net, doc=None):
+    if doc is None:
+        doc = Sheet()
     # If there are generated subnets
-    if subnet.networks:
+    if current().networks:
         doc.add_heading('Subnet Table', level=2)
         table = doc.add_table(rows=0, cols=3, style="Table Grid")
         header = table.add_row().cells
         header[0].text = "Subnet Address"
         header[1].text = "Subnet Mask"
         header[2].text = "Broadcast Address"
-        for network in subnet.networks:
+        for network in current().networks:
             row = table.add_row().cells
             row[0].text = str(network)
             row[1].text = str(network.netmask)
@@ -53,7 +58,9 @@ def subnet_table(net, doc=Document()):
     return doc
 
 
-def switch_graph(net, doc=Document()):
+def switch_graph(net, doc=None):
+    if doc is None:
+        doc = Sheet()
     if net.switches:
         graph = nx.Graph()
         # Add all switches to the graph
@@ -71,7 +78,9 @@ def switch_graph(net, doc=Document()):
     return doc
 
 
-def writeAnswers(net, doc=Document()):
+def writeAnswers(net, doc=None):
+    if doc is None:
+        doc = Sheet()
     doc = docker_hosts(net, doc)
     doc = subnet_table(net, doc)
     doc = switch_graph(net, doc)
@@ -89,6 +98,10 @@ def add_hyperlink(paragraph, url, text):
     :param text: The text displayed for the url
     :return: The hyperlink object
     """
+    # Sheets write the hyperlink themselves
+    if hasattr(paragraph, 'add_hyperlink'):
+        return paragraph.add_hyperlink(url, text)
+
     import docx
 
     # This gets access to the document.xml.rels file and gets a new relation id value
@@ -0,0 +1,329 @@
+"""
+Dry Run Network
+===============
+
+An in-memory stand-in for `Containernet` that lets a scenario's `create_network`, `run_network` and `generate_questions`
+run without root, Docker or Open vSwitch. Nothing is started; nodes only record the interfaces, addresses and links
+that the real network would have, so answer sheets can be generated in seconds.
+
+Nodes keep their own class (e.g. `Kali` or `VlanSwitch`) so scenario specific methods still work,
+but every method that would touch the system is replaced by a no-op.
+Links draw their MAC addresses exactly as `Mininet.addLink` does, so a seed produces the same values as a real run.
+"""
+
+import random
+
+from mininet.node import Controller, Docker, Host, OVSKernelSwitch
+from mininet.util import ipAdd, netParse
+from typing import Any, Dict, List, Type
+
+from utils.network import rand_mac
+from utils.session import current
+
+
+class DryIntf(object):
+
+    def __init__(self, name, node, port=None, link=None, mac=None, **params):
+        """
+        Records an interface the way `mininet.link.Intf` would configure it.
+
+        :param name: Interface name, e.g. 'h1-eth0'
+        :param node: The node the interface belongs to
+        :param port: Port number on the node
+        :param link: The link the interface is part of
+        :param mac: MAC address of the interface
+        """
+        self.name = name
+        self.node = node
+        self.link = link
+        self.mac = mac
+        self.ip = None
+        self.prefixLen = None
+        self.params = params
+        node.addIntf(self, port=port)
+
+    def IP(self):
+        return self.ip
+
+    def MAC(self):
+        return self.mac
+
+    def setIP(self, ipstr, prefixLen=None):
+        """Sets the IP address, accepts either 'ip/prefix' or an address and prefix length."""
+        if '/' in ipstr:
+            ipstr, prefixLen = ipstr.split('/')
+        self.ip = ipstr
+        self.prefixLen = int(prefixLen)
+
+    def setMAC(self, macstr):
+        self.mac = macstr
+
+    def isUp(self, setUp=False):
+        return True
+
+    def delete(self):
+        self.node.delIntf(self)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+    def __str__(self):
+        return self.name
+
+
+class DryLink(object):
+
+    def __init__(self, node1, node2, port1=None, port2=None, intfName1=None, intfName2=None,
+                 addr1=None, addr2=None, **params):
+        """
+        Records a link between two nodes, with the same port numbering and interface names as `mininet.link.Link`.
+        Link specific parameters (e.g. bandwidth for TCLink) are kept but otherwise ignored.
+        """
+        if port1 is None:
+            port1 = node1.newPort()
+        if port2 is None:
+            port2 = node2.newPort()
+        if not intfName1:
+            intfName1 = '%s-eth%s' % (node1.name, port1)
+        if not intfName2:
+            intfName2 = '%s-eth%s' % (node2.name, port2)
+        self.params = params
+        self.intf1 = DryIntf(intfName1, node1, port1, self, addr1)
+        self.intf2 = DryIntf(intfName2, node2, port2, self, addr2)
+
+    def stop(self):
+        self.intf1.delete()
+        self.intf2.delete()
+
+    def delete(self):
+        self.stop()
+
+    def __str__(self):
+        return '%s<->%s' % (self.intf1, self.intf2)
+
+
+class DryNode(object):
+    """
+    Node behaviour used in place of `mininet.node.Node`.
+    Placed in front of the first Mininet class of a node so the node's own (DVNI) methods are still used.
+    """
+
+    def __init__(self, name, dimage=None, **params):
+        self.name = name
+        self.params = params
+        self.intfs = {}
+        self.ports = {}
+        self.nameToIntf = {}
+        self.waiting = False
+        # Containernet stores these for Docker nodes
+        self.dimage = dimage
+        self.port_bindings = params.get('port_bindings', {})
+
+    def build(self, name, progress=None, packages=()):
+        """Replaces `container.Docker.build`, no image is needed for a dry run."""
+        return name
+
+    def newPort(self):
+        if len(self.ports) > 0:
+            return max(self.ports.values()) + 1
+        # Mininet numbers host ports from 0 and switch ports from 1
+        return self.portBase
+
+    def addIntf(self, intf, port=None, **kwargs):
+        if port is None:
+            port = self.newPort()
+        self.intfs[port] = intf
+        self.ports[intf] = port
+        self.nameToIntf[intf.name] = intf
+
+    def delIntf(self, intf):
+        port = self.ports.get(intf)
+        if port is not None:
+            del self.intfs[port]
+            del self.ports[intf]
+            del self.nameToIntf[intf.name]
+
+    def defaultIntf(self):
+        if self.intfs:
+            return self.intfs[min(self.intfs.keys())]
+        return None
+
+    def intf(self, intf=None):
+        if not intf:
+            return self.defaultIntf()
+        if isinstance(intf, str):
+            return self.nameToIntf[intf]
+        return intf
+
+    def intfList(self):
+        return [self.intfs[port] for port in sorted(self.intfs.keys())]
+
+    def intfNames(self):
+        return [str(intf) for intf in self.intfList()]
+
+    def IP(self, intf=None):
+        intf = self.intf(intf)
+        return intf.IP() if intf else None
+
+    def MAC(self, intf=None):
+        intf = self.intf(intf)
+        return intf.MAC() if intf else None
+
+    def setIP(self, ip, prefixLen=8, intf=None, **kwargs):
+        return self.intf(intf).setIP(ip, prefixLen)
+
+    def setMAC(self, mac, intf=None):
+        return self.intf(intf).setMAC(mac)
+
+    def cmd(self, *args, **kwargs):
+        return ''
+
+    def sendCmd(self, *args, **kwargs):
+        self.waiting = True
+
+    def waitOutput(self, *args, **kwargs):
+        self.waiting = False
+        return ''
+
+    def dpctl(self, *args, **kwargs):
+        return ''
+
+    def vsctl(self, *args, **kwargs):
+        return ''
+
+    def config(self, **params):
+        return {}
+
+    def configDefault(self, **moreParams):
+        pass
+
+    def start(self, *args, **kwargs):
+        pass
+
+    def stop(self, *args, **kwargs):
+        pass
+
+    def terminate(self):
+        pass
+
+    def __repr__(self):
+        return '<%s %s: %s pid=None> ' % (self.__class__.__name__, self.name, ','.join(self.intfNames()))
+
+    def __str__(self):
+        return self.name
+
+
+_classes = {}  # type: Dict[Type, Type]
+"""Cache of dry classes created for each node class."""
+
+
+def dry_class(cls):
+    # type: (Type) -> Type
+    """
+    Creates a version of a node class that uses `DryNode` in place of its Mininet base classes.
+    For `Kali` the method resolution order becomes: Kali, container.Docker, DryDocker, DryNode, mininet.node.Docker, ...
+    """
+    if cls not in _classes:
+        # The first class that belongs to Mininet, everything before it is ours
+        base = next(c for c in cls.__mro__ if c.__module__.split('.')[0] == 'mininet')
+        dry_base = type('Dry' + base.__name__, (DryNode, base), {})
+        if base is cls:
+            _classes[cls] = dry_base
+        else:
+            # DryNode.build is repeated here as container.Docker.build comes first in the MRO
+            _classes[cls] = type(cls.__name__, (cls, dry_base), {'build': DryNode.__dict__['build']})
+    return _classes[cls]
+
+
+class DryNet(object):
+
+    def __init__(self, controller=None, ipBase='10.0.0.0/8', rng=None, **params):
+        """
+        In-memory network with the parts of the `Containernet` API used by scenarios.
+
+        :param controller: Controller class, only recorded.
+        :param ipBase: Base address range for hosts added without an IP, as in Mininet.
+        :param rng: Random number generator for MAC addresses, the current session's by default.
+        """
+        self.controller = controller
+        self.random = rng or current().random  # type: random.Random
+        self.hosts = []  # type: List[Any]
+        self.switches = []  # type: List[Any]
+        self.controllers = []  # type: List[Any]
+        self.links = []  # type: List[DryLink]
+        self.nameToNode = {}  # type: Dict[str, Any]
+        self.ipBaseNum, self.prefixLen = netParse(ipBase)
+        self.nextIP = 1
+
+    def randMac(self):
+        """Return a random, non-multicast MAC address, identical to `Mininet.randMac`."""
+        return rand_mac(self.random)
+
+    def _add(self, nodes, cls, name, **params):
+        node = dry_class(cls)(name, **params)
+        nodes.append(node)
+        self.nameToNode[name] = node
+        return node
+
+    def addHost(self, name, cls=None, **params):
+        defaults = {'ip': ipAdd(self.nextIP, ipBaseNum=self.ipBaseNum, prefixLen=self.prefixLen) + '/%s' % self.prefixLen}
+        self.nextIP += 1
+        defaults.update(params)
+        return self._add(self.hosts, cls or Host, name, **defaults)
+
+    def addDocker(self, name, cls=None, **params):
+        return self.addHost(name, cls=cls or Docker, **params)
+
+    def addSwitch(self, name, cls=None, **params):
+        return self._add(self.switches, cls or OVSKernelSwitch, name, **params)
+
+    def addController(self, name='c0', controller=None, **params):
+        # Controllers are recorded as plain nodes, nothing (e.g. a POX script) is set up for them
+        return self._add(self.controllers, Controller, name, **params)
+
+    def addLink(self, node1, node2, port1=None, port2=None, cls=None, **params):
+        node1 = self[node1] if isinstance(node1, str) else node1
+        node2 = self[node2] if isinstance(node2, str) else node2
+        options = dict(params)
+        # Mininet draws two random MACs for every link, doing the same keeps the random sequence identical
+        options.setdefault('addr1', self.randMac())
+        options.setdefault('addr2', self.randMac())
+        link = DryLink(node1, node2, port1, port2, **options)
+        self.links.append(link)
+        return link
+
+    def linksBetween(self, node1, node2):
+        return [link for link in self.links
+                if (node1, node2) in ((link.intf1.node, link.intf2.node), (link.intf2.node, link.intf1.node))]
+
+    def removeLink(self, link=None, node1=None, node2=None):
+        if not link:
+            node1 = self[node1] if isinstance(node1, str) else node1
+            node2 = self[node2] if isinstance(node2, str) else node2
+            links = self.linksBetween(node1, node2)
+        else:
+            links = [link]
+        for link in links:
+            link.stop()
+            self.links.remove(link)
+
+    def get(self, *args):
+        nodes = [self.nameToNode[name] for name in args]
+        return nodes[0] if len(nodes) == 1 else nodes
+
+    getNodeByName = get
+
+    def __getitem__(self, key):
+        return self.nameToNode[key]
+
+    def __contains__(self, item):
+        return item in self.nameToNode
+
+    def start(self):
+        """Assigns each host's IP to its default interface, as `Mininet.configHosts` does when starting."""
+        for host in self.hosts:
+            if host.defaultIntf() and host.params.get('ip'):
+                host.setIP(host.params['ip'])
+
+    def stop(self):
+        pass
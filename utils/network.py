@@ -3,13 +3,28 @@ Mininet Network Generation
 ====================================
 """
 
+import random
+
 import networkx
 from mininet.link import Link
 from mininet.net import Mininet
 from mininet.node import OVSSwitch
+from mininet.util import macColonHex
 from typing import Callable, Any, Tuple, List
 
 
+def rand_mac(rng):
+    # type: (random.Random) -> str
+    """
+    Return a random, non-multicast MAC address, identical to `Mininet.randMac` but drawn from 'rng'.
+    Set as a network's 'randMac' so the MACs given to links are reproducible.
+
+    Example:
+        >>> net.randMac = lambda: rand_mac(scenario.random)
+    """
+    return macColonHex(rng.randint(1, 2 ** 48 - 1) & 0xfeffffffffff | 0x020000000000)
+
+
 def add_switches(net, count, graph_method=networkx.path_graph, **switch_kwargs):
     # type: (Mininet, int, Callable, **Any) -> Tuple[List[Any], List[Link]]
     """
@@ -0,0 +1,147 @@
+"""
+Readiness
+=========
+
+Checks that the services of a started network are actually usable, instead of assuming they are once started.
+Each probe is a shell test run inside a node. All of a node's probes are polled by a single loop in the node's shell,
+and the loops of every node run at the same time, so waiting takes as long as the slowest node rather than the sum of them.
+"""
+
+import math
+import select
+import time
+
+from mininet.log import info, warn
+from mininet.node import Node
+from typing import Dict, List, Optional
+
+
+class Probe(object):
+
+    def __init__(self, description, test):
+        # type: (str, str) -> None
+        """
+        A check that part of a node is ready.
+
+        :param description: Shown in logs if the probe doesn't pass, e.g. 'tcp/21 listening'
+        :param test: Shell command that exits with 0 once ready
+        """
+        self.description = description
+        self.test = test
+
+    def __repr__(self):
+        return "Probe(%r)" % self.description
+
+
+def tcp_listen(port):
+    # type: (int) -> Probe
+    """Passes once a socket is listening on the TCP port, read from /proc so no tools are needed in the node."""
+    # The local address column ends with the port in hex, state 0A is LISTEN
+    return Probe('tcp/%d listening' % port,
+                 "cat /proc/net/tcp /proc/net/tcp6 2>/dev/null | grep -qiE ':%04X [0-9A-F:]+ 0A '" % port)
+
+
+def udp_bind(port):
+    # type: (int) -> Probe
+    """Passes once a socket is bound to the UDP port."""
+    return Probe('udp/%d bound' % port,
+                 "cat /proc/net/udp /proc/net/udp6 2>/dev/null | grep -qiE '^ *[0-9]+: [0-9A-F]+:%04X '" % port)
+
+
+def process_alive(name):
+    # type: (str) -> Probe
+    """Passes while a process with the exact name is running."""
+    return Probe('process %s alive' % name, "pgrep -x %s >/dev/null" % name)
+
+
+def ovs_port_up(intf):
+    # type: (str) -> Probe
+    """Passes once Open vSwitch reports the link of a switch port as up."""
+    return Probe('port %s up' % intf, "ovs-vsctl get interface %s link_state 2>/dev/null | grep -q up" % intf)
+
+
+def controller_connected(switch):
+    # type: (str) -> Probe
+    """Passes once the switch is connected to at least one of its controllers, as `OVSSwitch.connected` checks."""
+    return Probe('%s connected to controller' % switch,
+                 "for c in $(ovs-vsctl get bridge %s controller | tr -d '[],'); do "
+                 "ovs-vsctl get controller $c is_connected; done | grep -q true" % switch)
+
+
+GRACE = 5
+"""Seconds past the timeout a node's shell is given to report, before its probes are interrupted."""
+
+
+def _script(probes, timeout, interval):
+    # type: (List[Probe], float, float) -> str
+    """Shell loop that polls the probes until all pass or the timeout expires, then prints each probe that failed."""
+    tests = ' && '.join('{ %s; }' % p.test for p in probes)
+    report = '; '.join('{ %s; } || echo FAILED %d' % (p.test, i) for i, p in enumerate(probes))
+    # Timed by the clock rather than by counting loops, as the probes themselves take time
+    return ('end=$(($(date +%%s) + %d)); until %s; do [ $(date +%%s) -ge $end ] && break; sleep %s; done; %s' %
+            (int(math.ceil(timeout)), tests, interval, report))
+
+
+def _monitor(node, timeout):
+    # type: (Node, float) -> str
+    """
+    Returns the output of the node's command, waiting up to timeout seconds for some.
+    Unlike `Node.monitor`, which also wakes when the shell can be written to and then blocks reading, this doesn't
+    block once the timeout has passed.
+    """
+    if node.readbuf or select.select([node.stdout], [], [], timeout)[0]:
+        return node.monitor()
+    return ''
+
+
+def wait_ready(probes, timeout=30, interval=0.1):
+    # type: (Dict[Node, List[Probe]], float, float) -> Dict[Node, Optional[float]]
+    """
+    Waits for every node's probes to pass, polling all nodes at the same time.
+
+    Example:
+        >>> wait_ready({ftpd: [process_alive('vsftpd'), tcp_listen(21)]})
+        *** ftp ready in 0.42s
+        {<Vsftpd ftp: ftp-eth0:10.0.0.2 pid=1234> : 0.42}
+
+    :param probes: Probes to run in each node
+    :param timeout: Seconds to wait for each node
+    :param interval: Seconds between checks
+    :return: Seconds each node took to be ready, None if it wasn't ready before the timeout.
+        A node whose probes are still running GRACE seconds after the timeout, e.g. because one has hung, is
+        interrupted and isn't ready.
+    """
+    started = time.time()
+    deadline = started + timeout + GRACE
+    output = {}
+    for node, node_probes in probes.items():
+        if node_probes:
+            # The shell can only run one command at a time, wait for any previous one to return
+            if node.waiting:
+                node.waitOutput()
+            node.sendCmd(_script(node_probes, timeout, interval))
+            output[node] = ''
+
+    ready = {}
+    while len(ready) < len(output) and time.time() < deadline:
+        for node in [n for n in output if n not in ready]:
+            output[node] += _monitor(node, 0.01)
+            if not node.waiting:
+                ready[node] = time.time() - started
+    for node in [n for n in output if n not in ready]:
+        node.sendInt()
+        # Read back to the prompt so the shell can be used again, if the probe stops when interrupted
+        interrupted = time.time()
+        while node.waiting and time.time() - interrupted < GRACE:
+            _monitor(node, 0.1)
+        warn('*** %s not ready after %.1fs: probes still running, interrupted\n' % (node, time.time() - started))
+    for node, seconds in ready.items():
+        failed = [probes[node][int(line.split()[1])] for line in output[node].splitlines()
+                  if line.startswith('FAILED ')]
+        if failed:
+            warn('*** %s not ready after %.1fs: %s\n' % (node, seconds, ', '.join(p.description for p in failed)))
+            ready[node] = None
+        else:
+            info('*** %s ready in %.2fs\n' % (node, seconds))
+    ready.update((node, None) for node in output if node not in ready)
+    return ready
@@ -0,0 +1,95 @@
+"""
+Timing Report
+=============
+
+Writes the results of a batch of scenario runs as JSON and CSV so build times can be tracked between versions.
+"""
+
+import csv
+import json
+import math
+import time
+
+from typing import Dict, List
+
+from utils.batch import Result
+
+PHASES = ('create_network', 'run_network', 'ready', 'documents', 'teardown')
+"""Phases of a scenario run, as recorded in `Scenario.timings`."""
+
+PERCENTILES = (50, 90, 99)
+"""Percentiles reported for every phase."""
+
+
+def percentile(values, p):
+    # type: (List[float], float) -> float
+    """
+    Nearest-rank percentile of a list of values.
+
+    Example:
+        >>> percentile([1, 2, 3, 4], 50)
+        2
+    """
+    ordered = sorted(values)
+    rank = int(math.ceil(p / 100.0 * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+def summarise(results):
+    # type: (List[Result]) -> Dict[str, Dict[str, Dict[str, float]]]
+    """
+    Calculates statistics for each phase of each scenario, only successful runs are included.
+
+    :return: {scenario module: {phase: {'count', 'mean', 'p50', 'p90', 'p99', 'max'}}}
+    """
+    summary = {}
+    for module in sorted(set(r.module for r in results)):
+        runs = [r for r in results if r.module == module and r.ok]
+        summary[module] = {}
+        for phase in PHASES + ('total',):
+            values = [r.elapsed if phase == 'total' else r.timings[phase] for r in runs
+                      if phase == 'total' or phase in r.timings]
+            if not values:
+                continue
+            stats = {'count': len(values),
+                     'mean': sum(values) / len(values),
+                     'max': max(values)}
+            for p in PERCENTILES:
+                stats['p%d' % p] = percentile(values, p)
+            summary[module][phase] = stats
+    return summary
+
+
+def write_report(results, path):
+    # type: (List[Result], str) -> Dict
+    """
+    Writes '[path].json', containing every run and a summary, and '[path].csv', containing the summary.
+
+    :param results: Results returned by `utils.batch.run_batch`
+    :param path: File path without an extension
+    :return: The report that was written as JSON
+    """
+    summary = summarise(results)
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': [{'scenario': r.module,
+                  'seed': r.seed,
+                  'ok': r.ok,
+                  'error': r.error,
+                  'elapsed': r.elapsed,
+                  'timings': r.timings} for r in results],
+        'summary': summary
+    }
+    with open(path + '.json', 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    columns = ['count', 'mean'] + ['p%d' % p for p in PERCENTILES] + ['max']
+    with open(path + '.csv', 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['scenario', 'phase'] + columns)
+        for module in sorted(summary):
+            for phase in PHASES + ('total',):
+                if phase in summary[module]:
+                    writer.writerow([module, phase] + ['%.3f' % summary[module][phase][c] if c != 'count'
+                                                       else summary[module][phase][c] for c in columns])
+    return report
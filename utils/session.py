@@ -0,0 +1,68 @@
+"""
+Session
+=======
+
+State that belongs to a single scenario run: the subnets and VLANs it has used, and the containers it has added and built.
+Utility functions such as `utils.subnet.generate` record what they hand out in the current session,
+so a new run starts from nothing instead of inheriting every network of the runs before it.
+Each scenario starts its own session when created, and ends it when its network is stopped.
+The current session belongs to the thread, so scenarios generated in separate threads each have their own.
+"""
+
+import random
+import threading
+
+from ipaddress import IPv4Network
+from typing import Any, Dict, List, Optional, Set
+
+
+class Session(object):
+
+    def __init__(self, rng=None):
+        # type: (random.Random) -> None
+        """
+        :param rng: Random number generator used by utility functions that aren't given one, a new unseeded one by default.
+        """
+        self.random = rng or random.Random()  # type: random.Random
+        """Random number generator of the run, seeded by the scenario so every run is reproducible on its own."""
+        self.networks = [IPv4Network(u"172.17.0.0/16")]  # type: List[IPv4Network]
+        """Networks generated by `utils.subnet`.
+        NOTE: 172.17.0.0/16 is used by Docker for internet connection"""
+        self.allocators = {}  # type: Dict[IPv4Network, Any]
+        """`utils.subnet.Allocator` for each CIDR networks have been generated from."""
+        self.vlans = None  # type: Optional[List[int]]
+        """Unused VLANs in a random order, generated by `utils.vlan` the first time a VLAN is requested."""
+        self.added = []  # type: List[Any]
+        """Docker containers added to the network, documented in answer sheets."""
+        self.built = set()  # type: Set[str]
+        """Docker images that have been built or found in the cache."""
+        self.leases = []  # type: List[Any]
+        """`utils.tenant.Lease` on the tenant number and host ports used by the run, released when it ends."""
+
+
+_local = threading.local()
+"""Holds the current session of each thread as 'session'."""
+
+
+def current():
+    # type: () -> Session
+    """Returns the current session, starting one if there isn't one."""
+    if getattr(_local, 'session', None) is None:
+        _local.session = Session()
+    return _local.session
+
+
+def begin(rng=None):
+    # type: (random.Random) -> Session
+    """Starts a new session and makes it the current one."""
+    _local.session = Session(rng)
+    return _local.session
+
+
+def end(session):
+    # type: (Session) -> None
+    """Ends the session if it's still the current one, releasing everything it recorded."""
+    for lease in session.leases:
+        lease.release()
+    if getattr(_local, 'session', None) is session:
+        _local.session = None
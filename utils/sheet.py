@@ -0,0 +1,624 @@
+"""
+Sheets
+======
+
+Fast generation of the task and answer sheets.
+
+`python-docx` unzips and parses its template for every `Document`, and re-serialises every part of it when saving,
+although only the body of a sheet changes. A `Template` is read once, a `Sheet` only builds the body,
+with the parts of python-docx's API used by scenarios: headings, paragraphs of runs, tables, hyperlinks and pictures.
+Saving copies the template's other zip entries as they are, already compressed, and streams the body's XML through
+the compressor so a sheet is written in one pass, even to a stream that can't seek.
+"""
+
+import os
+import random
+import re
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+EMU_PER_INCH = 914400
+
+_HYPERLINK = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink'
+_IMAGE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+_DOS_DATE = (0 << 9) | (1 << 5) | 1
+"""1980-01-01, the date of generated zip entries, so the same sheet is always written as the same bytes."""
+
+
+def _xml(value):
+    # type: (Any) -> str
+    """Escapes text for use in an element, as python-docx does with tabs and newlines becoming <w:tab/> and <w:br/>."""
+    parts = []
+    for i, line in enumerate(re.split(r'\r\n|\r|\n', '%s' % value)):
+        if i:
+            parts.append('<w:br/>')
+        for j, text in enumerate(line.split('\t')):
+            if j:
+                parts.append('<w:tab/>')
+            if text:
+                parts.append('<w:t xml:space="preserve">%s</w:t>' % escape(text))
+    return ''.join(parts)
+
+
+def _encode(text):
+    # type: (Union[str, bytes]) -> bytes
+    return text if isinstance(text, bytes) else text.encode('utf-8')
+
+
+class Template(object):
+
+    _default = None  # type: Template
+
+    def __init__(self, path=None):
+        # type: (str) -> None
+        """
+        A .docx file read once, to create sheets from.
+
+        :param path: The template, python-docx's default template by default.
+        """
+        if path is None:
+            import docx.api
+            path = docx.api._default_docx_path()
+        self.path = path
+        self.entries = []  # type: List[Tuple[zipfile.ZipInfo, bytes]]
+        """Each zip entry of the template, with its compressed data."""
+        with open(path, 'rb') as f:
+            archive = zipfile.ZipFile(f)
+            for info in archive.infolist():
+                # The entry's data follows its local header, which has the name and extra field of variable lengths
+                f.seek(info.header_offset)
+                header = f.read(30)
+                name_length, extra_length = struct.unpack('<HH', header[26:30])
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                self.entries.append((info, f.read(info.compress_size)))
+            self.document = archive.read('word/document.xml').decode('utf-8')
+            self.relationships = archive.read('word/_rels/document.xml.rels').decode('utf-8')
+            self.content_types = archive.read('[Content_Types].xml').decode('utf-8')
+            styles = archive.read('word/styles.xml').decode('utf-8')
+
+        body = self.document.index('<w:body>') + len('<w:body>')
+        section = self.document.rindex('<w:sectPr')
+        self.head = self.document[:body]
+        """document.xml up to the start of the body."""
+        self.tail = self.document[section:]
+        """document.xml from the section properties at the end of the body."""
+
+        # Width of the text between the margins, tables are split evenly across it
+        width = int(re.search(r'<w:pgSz[^>]*w:w="(\d+)"', self.tail).group(1))
+        margins = sum(int(m) for m in re.search(r'<w:pgMar[^>]*w:right="(\d+)"[^>]*w:left="(\d+)"', self.tail).groups())
+        self.text_width = width - margins
+        """Twips between the page margins."""
+
+        self.styles = {}  # type: Dict[str, str]
+        """Style IDs by lower case name, e.g. {'heading 1': 'Heading1', 'table grid': 'TableGrid'}."""
+        for style in re.finditer(r'<w:style\b[^>]*w:styleId="([^"]+)"[^>]*>\s*<w:name w:val="([^"]+)"', styles):
+            self.styles[style.group(2).lower()] = style.group(1)
+
+        ids = [int(i) for i in re.findall(r'Id="rId(\d+)"', self.relationships)]
+        self.next_relationship = max(ids) + 1 if ids else 1
+        """First relationship ID free for a sheet's hyperlinks and pictures."""
+
+    @classmethod
+    def default(cls):
+        # type: () -> Template
+        """Returns python-docx's default template, read the first time it's needed."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def style_id(self, name):
+        # type: (str) -> str
+        """Style ID for a style name as python-docx accepts them, e.g. 'Heading 1' or 'Table Grid'."""
+        return self.styles.get(name.lower(), name.replace(' ', ''))
+
+
+class Run(object):
+
+    def __init__(self, text='', style=None):
+        # type: (str, str) -> None
+        self.text = text
+        self.style = style
+        self.bold = None  # type: Optional[bool]
+        self.italic = None  # type: Optional[bool]
+        self.underline = None  # type: Optional[bool]
+
+    def xml(self, sheet):
+        # type: (Sheet) -> str
+        properties = ''
+        if self.style:
+            properties += '<w:rStyle w:val=%s/>' % quoteattr(sheet.template.style_id(self.style))
+        if self.bold is not None:
+            properties += '<w:b/>' if self.bold else '<w:b w:val="0"/>'
+        if self.italic is not None:
+            properties += '<w:i/>' if self.italic else '<w:i w:val="0"/>'
+        if self.underline is not None:
+            properties += '<w:u w:val="%s"/>' % ('single' if self.underline else 'none')
+        return '<w:r>%s%s</w:r>' % ('<w:rPr>%s</w:rPr>' % properties if properties else '', _xml(self.text))
+
+
+class Hyperlink(object):
+
+    def __init__(self, relationship, text, anchor=None):
+        # type: (Optional[str], str, str) -> None
+        """A link to a web page through a relationship, or to a bookmark in the same document."""
+        self.relationship = relationship
+        self.text = text
+        self.anchor = anchor
+
+    def xml(self, sheet):
+        # type: (Sheet) -> str
+        target = 'w:anchor=%s' % quoteattr(self.anchor) if self.anchor else 'r:id="%s"' % self.relationship
+        return ('<w:hyperlink %s><w:r><w:rPr><w:color w:val="0000EE"/><w:u w:val="single"/></w:rPr>'
+                '%s</w:r></w:hyperlink>' % (target, _xml(self.text)))
+
+
+class Bookmark(object):
+
+    def __init__(self, number, name):
+        # type: (int, str) -> None
+        """A place in the document that hyperlinks can jump to, named with up to 40 letters, digits and underscores."""
+        self.number = number
+        self.name = name
+
+    def xml(self, sheet):
+        # type: (Sheet) -> str
+        return '<w:bookmarkStart w:id="%d" w:name=%s/><w:bookmarkEnd w:id="%d"/>' % (
+            self.number, quoteattr(self.name), self.number)
+
+
+class Break(object):
+
+    def xml(self, sheet):
+        # type: (Sheet) -> str
+        return '<w:r><w:br w:type="page"/></w:r>'
+
+
+class Picture(object):
+
+    def __init__(self, relationship, number, width, height):
+        # type: (str, int, int, int) -> None
+        """A picture in a run, its width and height in EMU."""
+        self.relationship = relationship
+        self.number = number
+        self.width = width
+        self.height = height
+
+    def xml(self, sheet):
+        # type: (Sheet) -> str
+        return ('<w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+                '<wp:extent cx="%(cx)d" cy="%(cy)d"/><wp:docPr id="%(n)d" name="Picture %(n)d"/>'
+                '<wp:cNvGraphicFramePr>'
+                '<a:graphicFrameLocks xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" noChangeAspect="1"/>'
+                '</wp:cNvGraphicFramePr>'
+                '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+                '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+                '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+                '<pic:nvPicPr><pic:cNvPr id="0" name="image%(n)d.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+                '<pic:blipFill><a:blip r:embed="%(rel)s"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+                '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="%(cx)d" cy="%(cy)d"/></a:xfrm>'
+                '<a:prstGeom prst="rect"/></pic:spPr></pic:pic></a:graphicData></a:graphic>'
+                '</wp:inline></w:drawing></w:r>' % {'cx': self.width, 'cy': self.height, 'n': self.number,
+                                                     'rel': self.relationship})
+
+
+class Paragraph(object):
+
+    def __init__(self, sheet, text='', style=None):
+        # type: (Sheet, str, str) -> None
+        self.sheet = sheet
+        self.style = style
+        self.runs = []  # type: List[Any]
+        if text:
+            self.add_run(text)
+
+    def add_run(self, text='', style=None):
+        # type: (str, str) -> Run
+        run = Run(text or '', style)
+        self.runs.append(run)
+        return run
+
+    def add_hyperlink(self, url, text, anchor=None):
+        # type: (Optional[str], str, str) -> Hyperlink
+        """
+        Adds a link, coloured and underlined as `utils.document.add_hyperlink` does.
+
+        :param url: Web page to link to
+        :param text: Text of the link
+        :param anchor: Name of a bookmark in the document to link to instead of a web page
+        """
+        if anchor:
+            link = Hyperlink(None, text, anchor)
+        else:
+            link = Hyperlink(self.sheet.relate(_HYPERLINK, url, external=True), text)
+        self.runs.append(link)
+        return link
+
+    def add_bookmark(self, name):
+        # type: (str) -> Bookmark
+        """Marks the start of the paragraph, so `add_hyperlink` can link to it by name."""
+        self.sheet.bookmarks += 1
+        bookmark = Bookmark(self.sheet.bookmarks, name)
+        self.runs.insert(0, bookmark)
+        return bookmark
+
+    @property
+    def text(self):
+        # type: () -> str
+        return ''.join('%s' % run.text for run in self.runs)
+
+    def xml(self):
+        # type: () -> str
+        properties = '<w:pPr><w:pStyle w:val=%s/></w:pPr>' % quoteattr(self.sheet.template.style_id(self.style)) \
+            if self.style else ''
+        return '<w:p>%s%s</w:p>' % (properties, ''.join(run.xml(self.sheet) for run in self.runs))
+
+
+class Cell(object):
+
+    def __init__(self, sheet):
+        # type: (Sheet) -> None
+        self.paragraphs = [Paragraph(sheet)]
+
+    @property
+    def text(self):
+        # type: () -> str
+        return '\n'.join(p.text for p in self.paragraphs)
+
+    @text.setter
+    def text(self, value):
+        # type: (str) -> None
+        self.paragraphs = [Paragraph(self.paragraphs[0].sheet, value)]
+
+    def add_paragraph(self, text='', style=None):
+        # type: (str, str) -> Paragraph
+        paragraph = Paragraph(self.paragraphs[0].sheet, text, style)
+        self.paragraphs.append(paragraph)
+        return paragraph
+
+
+class Row(object):
+
+    def __init__(self, sheet, columns):
+        # type: (Sheet, int) -> None
+        self.cells = [Cell(sheet) for _ in range(columns)]
+
+
+class Table(object):
+
+    def __init__(self, sheet, rows, cols, style=None):
+        # type: (Sheet, int, int, str) -> None
+        self.sheet = sheet
+        self.columns = cols
+        self.style = style
+        self.rows = [Row(sheet, cols) for _ in range(rows)]
+
+    def add_row(self):
+        # type: () -> Row
+        row = Row(self.sheet, self.columns)
+        self.rows.append(row)
+        return row
+
+    def cell(self, row_idx, col_idx):
+        # type: (int, int) -> Cell
+        return self.rows[row_idx].cells[col_idx]
+
+    def xml(self):
+        # type: () -> str
+        # Columns share the width between the margins, as python-docx sets them
+        width = self.sheet.template.text_width // max(1, self.columns)
+        style = '<w:tblStyle w:val=%s/>' % quoteattr(self.sheet.template.style_id(self.style)) if self.style else ''
+        parts = ['<w:tbl><w:tblPr>%s<w:tblW w:type="auto" w:w="0"/>'
+                 '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" '
+                 'w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>%s</w:tblGrid>'
+                 % (style, '<w:gridCol w:w="%d"/>' % width * self.columns)]
+        for row in self.rows:
+            parts.append('<w:tr>')
+            for cell in row.cells:
+                parts.append('<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="%d"/></w:tcPr>%s</w:tc>'
+                             % (width, ''.join(p.xml() for p in cell.paragraphs)))
+            parts.append('</w:tr>')
+        parts.append('</w:tbl>')
+        return ''.join(parts)
+
+
+def _png_size(data):
+    # type: (bytes) -> Tuple[int, int]
+    """Width and height of a PNG in EMU, using its resolution if it has one and 72 dpi if not, as python-docx does."""
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('Only PNG pictures are supported')
+    width, height = struct.unpack('>II', data[16:24])
+    dpi_x = dpi_y = 72
+    # Chunks are a length, a type, the data and a CRC
+    offset = 8
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        if kind == b'pHYs':
+            x, y, unit = struct.unpack('>IIB', data[offset + 8:offset + 17])
+            # Unit 1 is pixels per metre
+            if unit == 1 and x and y:
+                dpi_x, dpi_y = int(round(x * 0.0254)), int(round(y * 0.0254))
+            break
+        if kind == b'IDAT':
+            break
+        offset += 12 + length
+    return width * EMU_PER_INCH // dpi_x, height * EMU_PER_INCH // dpi_y
+
+
+class Sheet(object):
+
+    def __init__(self, template=None):
+        # type: (Template) -> None
+        """
+        A document created from a template, with the parts of python-docx's `Document` API used by scenarios.
+
+        Example:
+            >>> sheet = Sheet()
+            >>> sheet.add_heading('Answers', level=3)
+            >>> sheet.add_paragraph('1. What is the Network Address: ').add_run('10.197.62.0').bold = True
+            >>> sheet.save('answers.docx')
+
+        :param template: Template to create the sheet from, python-docx's default template by default.
+        """
+        self.template = template or Template.default()
+        self.blocks = []  # type: List[Union[Paragraph, Table]]
+        self.relationships = []  # type: List[Tuple[str, str, str, bool]]
+        """(ID, type, target, external) of each hyperlink and picture."""
+        self.media = []  # type: List[Tuple[str, bytes]]
+        """(Name, data) of each picture."""
+        self.bookmarks = 0
+        """Number of bookmarks added, each needs its own ID."""
+
+    def relate(self, kind, target, external=False):
+        # type: (str, str, bool) -> str
+        """Adds a relationship from the document to a hyperlink or picture, returning its ID."""
+        relationship = 'rId%d' % (self.template.next_relationship + len(self.relationships))
+        self.relationships.append((relationship, kind, target, external))
+        return relationship
+
+    def add_heading(self, text='', level=1):
+        # type: (str, int) -> Paragraph
+        return self.add_paragraph(text, 'Title' if level == 0 else 'Heading %d' % level)
+
+    def add_paragraph(self, text='', style=None):
+        # type: (str, str) -> Paragraph
+        paragraph = Paragraph(self, text, style)
+        self.blocks.append(paragraph)
+        return paragraph
+
+    def add_page_break(self):
+        # type: () -> Paragraph
+        paragraph = self.add_paragraph()
+        paragraph.runs.append(Break())
+        return paragraph
+
+    def add_table(self, rows, cols, style=None):
+        # type: (int, int, str) -> Table
+        table = Table(self, rows, cols, style)
+        self.blocks.append(table)
+        return table
+
+    def add_picture(self, image, width=None, height=None):
+        # type: (Union[str, BinaryIO], int, int) -> Picture
+        """
+        Adds a PNG picture in a paragraph of its own. The image is read straight away.
+
+        :param image: Path or file of the image
+        :param width: Width in EMU, the image's own size by default. If only one of width/height is given the other is scaled.
+        :param height: Height in EMU
+        """
+        if hasattr(image, 'read'):
+            data = image.read()
+        else:
+            with open(image, 'rb') as f:
+                data = f.read()
+        native_width, native_height = _png_size(data)
+        if width is None and height is None:
+            width, height = native_width, native_height
+        elif height is None:
+            height = native_height * width // native_width
+        elif width is None:
+            width = native_width * height // native_height
+        name = 'image%d.png' % (len(self.media) + 1)
+        self.media.append((name, data))
+        picture = Picture(self.relate(_IMAGE, 'media/' + name), len(self.media), width, height)
+        self.add_paragraph().runs.append(picture)
+        return picture
+
+    def _document(self):
+        # type: () -> Iterator[str]
+        """document.xml, a block at a time."""
+        yield self.template.head
+        for block in self.blocks:
+            yield block.xml()
+        yield self.template.tail
+
+    def _relationships(self):
+        # type: () -> str
+        end = self.template.relationships.rindex('</Relationships>')
+        added = ''.join('<Relationship Id="%s" Type="%s" Target=%s%s/>'
+                        % (relationship, kind, quoteattr(target), ' TargetMode="External"' if external else '')
+                        for relationship, kind, target, external in self.relationships)
+        return self.template.relationships[:end] + added + self.template.relationships[end:]
+
+    def _content_types(self):
+        # type: () -> str
+        if 'Extension="png"' in self.template.content_types:
+            return self.template.content_types
+        end = self.template.content_types.index('<Override')
+        return (self.template.content_types[:end] + '<Default Extension="png" ContentType="image/png"/>' +
+                self.template.content_types[end:])
+
+    def save(self, path_or_stream):
+        # type: (Union[str, BinaryIO]) -> None
+        """
+        Writes the sheet as a .docx file. Every zip entry is written in order, so the stream doesn't need to seek.
+
+        :param path_or_stream: File name or a stream opened for binary writing
+        """
+        if not hasattr(path_or_stream, 'write'):
+            with open(path_or_stream, 'wb') as f:
+                return self.save(f)
+        archive = ZipStream(path_or_stream)
+        for info, data in self.template.entries:
+            if info.filename == 'word/document.xml':
+                archive.write(info.filename, self._document())
+            elif info.filename == 'word/_rels/document.xml.rels' and self.relationships:
+                archive.write(info.filename, [self._relationships()])
+            elif info.filename == '[Content_Types].xml' and self.media:
+                archive.write(info.filename, [self._content_types()])
+            else:
+                archive.copy(info, data)
+        for name, data in self.media:
+            archive.write('word/media/' + name, [data])
+        archive.close()
+
+
+class ZipStream(object):
+
+    def __init__(self, stream):
+        # type: (BinaryIO) -> None
+        """
+        Writes a zip file in a single pass.
+        Template entries are copied compressed, generated entries are compressed as they're written,
+        with their sizes and CRC in a data descriptor after the data.
+        """
+        self.stream = stream
+        self.offset = 0
+        self.central = []  # type: List[bytes]
+
+    def _out(self, data):
+        # type: (bytes) -> None
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _entry(self, name, flags, method, dos_time, dos_date, crc, compressed, size, offset):
+        # type: (bytes, int, int, int, int, int, int, int, int) -> None
+        """Records the central directory entry of an entry whose local header is at 'offset'."""
+        self.central.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, flags, method, dos_time, dos_date,
+                                        crc, compressed, size, len(name), 0, 0, 0, 0, 0, offset) + name)
+
+    def copy(self, info, data):
+        # type: (zipfile.ZipInfo, bytes) -> None
+        """Copies an entry of another zip file, given its compressed data."""
+        name = _encode(info.filename)
+        dos_date = (info.date_time[0] - 1980) << 9 | info.date_time[1] << 5 | info.date_time[2]
+        dos_time = info.date_time[3] << 11 | info.date_time[4] << 5 | info.date_time[5] // 2
+        # Sizes are known, so they go in the local header rather than a data descriptor
+        flags = info.flag_bits & ~0x08
+        self._entry(name, flags, info.compress_type, dos_time, dos_date, info.CRC, info.compress_size, info.file_size,
+                    self.offset)
+        self._out(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, flags, info.compress_type, dos_time, dos_date,
+                              info.CRC, info.compress_size, info.file_size, len(name), 0) + name)
+        self._out(data)
+
+    def open(self, filename):
+        # type: (str) -> ZipEntry
+        """Starts an entry, its data is compressed as it's written. Only one entry can be open at a time."""
+        return ZipEntry(self, filename)
+
+    def write(self, filename, chunks):
+        # type: (str, Iterator[Union[str, bytes]]) -> None
+        """Compresses and writes an entry a chunk at a time."""
+        entry = self.open(filename)
+        for chunk in chunks:
+            entry.write(chunk)
+        entry.close()
+
+    def close(self):
+        # type: () -> None
+        """Writes the central directory, completing the file."""
+        start = self.offset
+        for entry in self.central:
+            self._out(entry)
+        self._out(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, len(self.central), len(self.central),
+                              self.offset - start, start, 0))
+
+
+class ZipEntry(object):
+
+    def __init__(self, archive, filename):
+        # type: (ZipStream, str) -> None
+        """An entry being written to a `ZipStream`, with its sizes and CRC in a data descriptor after the data."""
+        self.archive = archive
+        self.name = _encode(filename)
+        self.start = archive.offset
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self.crc = self.size = self.compressed = 0
+        archive._out(struct.pack('<IHHHHHIIIHH', 0x04034b50, 20, 0x08, zipfile.ZIP_DEFLATED, 0, _DOS_DATE,
+                                 0, 0, 0, len(self.name), 0) + self.name)
+
+    def write(self, chunk):
+        # type: (Union[str, bytes]) -> None
+        chunk = _encode(chunk)
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.size += len(chunk)
+        data = self.compressor.compress(chunk)
+        self.compressed += len(data)
+        self.archive._out(data)
+
+    def close(self):
+        # type: () -> None
+        data = self.compressor.flush()
+        self.compressed += len(data)
+        self.archive._out(data)
+        self.crc &= 0xffffffff
+        self.archive._out(struct.pack('<IIII', 0x08074b50, self.crc, self.compressed, self.size))
+        self.archive._entry(self.name, 0x08, zipfile.ZIP_DEFLATED, 0, _DOS_DATE, self.crc, self.compressed, self.size,
+                            self.start)
+
+
+def _answer_sheet(document, rng):
+    # type: (Any, random.Random) -> None
+    """Fills a document like a scenario's answer sheet, with a table and 20 questions."""
+    document.add_heading('Host Scanning', level=2)
+    document.add_paragraph('Connect to port ').add_run('5900').bold = True
+    table = document.add_table(rows=0, cols=3, style='Table Grid')
+    for _ in range(4):
+        row = table.add_row().cells
+        row[0].text = '10.%d.%d.0/24' % (rng.randrange(256), rng.randrange(256))
+        row[1].text = '255.255.255.0'
+        row[2].text = '10.%d.%d.255' % (rng.randrange(256), rng.randrange(256))
+    document.add_heading('Answers', level=3)
+    for i in range(20):
+        document.add_paragraph('%d. What is the address of host %d: ' % (i + 1, i)).add_run(
+            '10.0.%d.%d' % (rng.randrange(256), rng.randrange(256))).bold = True
+
+
+def benchmark(count=500):
+    # type: (int) -> Dict[str, float]
+    """
+    Times creating and saving 'count' answer sheets with python-docx and with `Sheet`.
+
+    Example:
+        >>> benchmark(500)
+        *** python-docx: 500 sheets in 27.80s (55.6ms each)
+        *** Sheet: 500 sheets in 0.58s (1.2ms each)
+    """
+    from docx import Document
+    directory = tempfile.mkdtemp()
+    timings = {}
+    try:
+        for name, create in [('python-docx', Document), ('Sheet', Sheet)]:
+            rng = random.Random(0)
+            started = time.time()
+            for i in range(count):
+                document = create()
+                _answer_sheet(document, rng)
+                document.save(os.path.join(directory, '%d.docx' % i))
+            timings[name] = time.time() - started
+            print('*** %s: %d sheets in %.2fs (%.1fms each)' % (name, count, timings[name], timings[name] * 1000 / count))
+    finally:
+        shutil.rmtree(directory)
+    return timings
+
+
+if __name__ == '__main__':
+    benchmark()
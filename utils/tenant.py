@@ -0,0 +1,248 @@
+"""
+Tenants
+=======
+
+Lets several scenarios run on the same VM at once, e.g. for a whole class.
+Each running scenario is a tenant with a number, and every node it adds is named with the tenant's prefix
+('kali' becomes 't3kali'), so container, interface and switch names don't collide.
+Host ports, such as those Kali publishes for VNC, are handed out by `PortAllocator`.
+
+Tenants and ports are leased with lock files held by the process using them,
+so they're shared by every process on the VM and returned by the kernel if a process dies.
+"""
+
+import errno
+import fcntl
+import os
+import re
+import socket
+
+from typing import Any, Optional
+
+from utils.session import current
+
+LOCK_DIRECTORY = '/tmp/dvni'
+"""Directory holding the lock file of each tenant and port."""
+
+MAX_TENANTS = 100
+"""Maximum number of tenants. Interface names can only be 15 characters, 't99ftpc10-eth0' is 14."""
+
+
+class Lease(object):
+
+    def __init__(self, kind, number, handle):
+        # type: (str, int, Any) -> None
+        """
+        A tenant number or port held by this process until released.
+
+        :param kind: What is leased, e.g. 'tenant' or 'vnc'
+        :param number: The tenant number or port
+        :param handle: Open lock file, the lease lasts as long as it's locked
+        """
+        self.kind = kind
+        self.number = number
+        self.handle = handle
+
+    def release(self):
+        # type: () -> None
+        if not self.handle.closed:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+
+    def __repr__(self):
+        return "Lease(%r, %d)" % (self.kind, self.number)
+
+
+def lease(kind, number):
+    # type: (str, int) -> Optional[Lease]
+    """
+    Takes the lease on a number if no process, including this one, holds it.
+
+    :return: The lease, or None if it's held.
+    """
+    if not os.path.exists(LOCK_DIRECTORY):
+        try:
+            os.makedirs(LOCK_DIRECTORY)
+        except OSError as e:
+            # Another process made it first
+            if e.errno != errno.EEXIST:
+                raise
+    handle = open(os.path.join(LOCK_DIRECTORY, '%s.%d.lock' % (kind, number)), 'a')
+    try:
+        # Each open file has its own lock, so this also fails if another thread of this process holds it
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        handle.close()
+        return None
+    return Lease(kind, number, handle)
+
+
+def port_free(port):
+    # type: (int) -> bool
+    """Checks nothing outside of DVNI, e.g. a container published by hand, is listening on the TCP port."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', port))
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+class PortAllocator(object):
+
+    def __init__(self, kind, first, count=MAX_TENANTS):
+        # type: (str, int, int) -> None
+        """
+        Hands out host ports from a range, each to one scenario at a time.
+
+        Example:
+            >>> vnc_ports = PortAllocator('vnc', 5900)
+            >>> vnc_ports.allocate()
+            5900
+            >>> vnc_ports.allocate()
+            5901
+
+        :param kind: Name of the range, used for its lock files
+        :param first: First port of the range, given out first so a single scenario keeps the usual port
+        :param count: Number of ports in the range
+        """
+        self.kind = kind
+        self.first = first
+        self.count = count
+
+    def allocate(self):
+        # type: () -> int
+        """
+        Leases the lowest free port in the range until the current session ends.
+
+        :return: The port
+        """
+        for port in range(self.first, self.first + self.count):
+            held = lease(self.kind, port)
+            if held is None:
+                continue
+            if port_free(port):
+                current().leases.append(held)
+                return port
+            held.release()
+        raise Exception('No free %s ports between %d and %d' % (self.kind, self.first, self.first + self.count - 1))
+
+
+controller_ports = PortAllocator('controller', 6653)
+"""OpenFlow ports for each tenant's controller, starting at the default."""
+
+
+class Tenant(object):
+
+    def __init__(self, number):
+        # type: (int) -> None
+        """
+        :param number: Tenant number, unique on the VM while the tenant runs
+        """
+        self.number = number
+        self.prefix = 't%d' % number
+        """Added to the start of every node name."""
+
+    def name(self, name):
+        # type: (str) -> str
+        return self.prefix + name
+
+    def dpid(self, name):
+        # type: (str) -> Optional[str]
+        """
+        Datapath ID for a switch, Mininet's default taken from the number in its name with the tenant number before it.
+        None if the name has no number, leaving the switch to fail as it would otherwise.
+        """
+        numbers = re.findall(r'\d+', name)
+        return '%x%08x' % (self.number + 1, int(numbers[0])) if numbers else None
+
+    def __repr__(self):
+        return "Tenant(%d)" % self.number
+
+
+def claim():
+    # type: () -> Tenant
+    """
+    Leases the lowest free tenant number until the current session ends.
+
+    Example:
+        >>> claim().name('kali')
+        't0kali'
+    """
+    for number in range(MAX_TENANTS):
+        held = lease('tenant', number)
+        if held is not None:
+            current().leases.append(held)
+            return Tenant(number)
+    raise Exception('All %d tenants are in use' % MAX_TENANTS)
+
+
+class TenantNet(object):
+    """
+    Mixed into a Mininet network class so every node it adds is named with a tenant's prefix.
+    Nodes are still found by the names they were added with, e.g. `net.get('kali')`.
+    Create with `tenant_net`.
+    """
+
+    tenant = None  # type: Tenant
+    allocate_ports = True
+    """Leases a port for each controller, off for dry runs where nothing listens on them."""
+
+    def _name(self, name):
+        # type: (Any) -> Any
+        """The name a node was given, if it was added by this network, otherwise the name as is."""
+        if isinstance(name, str) and self.tenant.name(name) in self.nameToNode:
+            return self.tenant.name(name)
+        return name
+
+    def addHost(self, name, cls=None, **params):
+        # Containernet's addDocker adds its containers with addHost
+        return super(TenantNet, self).addHost(self.tenant.name(name), cls=cls, **params)
+
+    def addSwitch(self, name, cls=None, **params):
+        if 'dpid' not in params and self.tenant.dpid(name):
+            params['dpid'] = self.tenant.dpid(name)
+        return super(TenantNet, self).addSwitch(self.tenant.name(name), cls=cls, **params)
+
+    def addController(self, name='c0', controller=None, **params):
+        if isinstance(name, str):
+            name = self.tenant.name(name)
+            # Each tenant's controller listens on its own port
+            if 'port' not in params and self.allocate_ports:
+                params['port'] = controller_ports.allocate()
+        return super(TenantNet, self).addController(name, controller=controller, **params)
+
+    def getNodeByName(self, *args):
+        return super(TenantNet, self).getNodeByName(*[self._name(name) for name in args])
+
+    def get(self, *args):
+        return super(TenantNet, self).get(*[self._name(name) for name in args])
+
+    def __getitem__(self, key):
+        return super(TenantNet, self).__getitem__(self._name(key))
+
+    def __contains__(self, item):
+        return super(TenantNet, self).__contains__(self._name(item))
+
+
+def tenant_net(net_class, tenant, allocate_ports=True, **kwargs):
+    # type: (type, Tenant, bool, **Any) -> Any
+    """
+    Creates a network whose nodes are named with the tenant's prefix.
+
+    Example:
+        >>> net = tenant_net(Containernet, claim(), controller=Controller)
+        >>> net.addDocker('kali', cls=Kali).name
+        't0kali'
+
+    :param net_class: Network class, e.g. Containernet
+    :param tenant: The tenant the network belongs to
+    :param allocate_ports: Lease a port for each controller, off for a `DryNet`
+    :param kwargs: Arguments for the network
+    """
+    return type('Tenant' + net_class.__name__, (TenantNet, net_class),
+                {'tenant': tenant, 'allocate_ports': allocate_ports})(**kwargs)
+
@@ -3,11 +3,15 @@ Virtual LAN
 =====================
 """
 import random
+import time
 from enum import Enum
 from mininet.link import Intf
 from mininet.node import OVSSwitch
+from mininet.util import quietRun
 from typing import Dict, List
 
+from utils.session import current
+
 
 class VlanMode(Enum):
     """
@@ -20,31 +24,30 @@ class VlanMode(Enum):
     TUNNEL = 'dot1q-tunnel'
 
 
-vlans = None
-"""Stores unused VLANs in a random order for use with the utility functions.
-   Generated the first time a VLAN is requested. 
-   Originally holds numbers from 1 to 0xFFE since 0 & 0xFFF are reserved VLANs"""
-
-
-def _generate_vlans():
-    global vlans
-    vlans = range(1, 0xFFE)
-    random.shuffle(vlans)
+def _vlans(rng=None):
+    # type: (random.Random) -> List[int]
+    """
+    Returns the unused VLANs of the current session in a random order, for use with the utility functions.
+    Generated the first time a VLAN is requested, shuffled with 'rng' or the session's random number generator.
+    Originally holds numbers from 1 to 0xFFE since 0 & 0xFFF are reserved VLANs
+    """
+    session = current()
+    if not session.vlans:
+        session.vlans = list(range(1, 0xFFE))
+        (rng or session.random).shuffle(session.vlans)
+    return session.vlans
 
 
-def random_vlan():
-    # type: () -> int
+def random_vlan(rng=None):
+    # type: (random.Random) -> int
     """Returns a random unused VLAN"""
-    if not vlans:
-        _generate_vlans()
-    return vlans.pop()
+    return _vlans(rng).pop()
 
 
-def random_vlans(count):
-    # type: (int) -> List[int]
+def random_vlans(count, rng=None):
+    # type: (int, random.Random) -> List[int]
     """Returns 'count' amount of random unused VLANs"""
-    if not vlans:
-        _generate_vlans()
+    vlans = _vlans(rng)
     return [vlans.pop() for _ in range(count)]
 
 
@@ -80,6 +83,25 @@ def trunk_intf(intf, trunks):
     _cmd_intf('set port %s trunks=' + ','.join(str(x) for x in trunks), intf)
 
 
+def port_settings(tag=None, trunks=None, mode=None):
+    # type: (int, List[int], VlanMode) -> str
+    """
+    Formats VLAN settings as the columns of an Open vSwitch port, so they can be set with a single 'set port' command.
+
+    Example:
+        >>> port_settings(tag=5, trunks=[5, 7], mode=VlanMode.UNTAGGED)
+        'tag=5 trunks=5,7 vlan_mode=native-untagged'
+    """
+    settings = []
+    if tag is not None:
+        settings.append('tag=%s' % tag)
+    if trunks:
+        settings.append('trunks=' + ','.join(str(x) for x in trunks))
+    if mode is not None:
+        settings.append('vlan_mode=' + mode.value)
+    return ' '.join(settings)
+
+
 def vlan_mode_intf(intf, mode=VlanMode.UNTAGGED):
     # type: (Intf, VlanMode) -> None
     """
@@ -122,12 +144,56 @@ class VlanSwitch(OVSSwitch):
         """Sets VLAN mode of an interface."""
         self.modes[intf] = mode
 
-    def start(self, controllers):
-        """Extends OVSSwitch function. Sets VLAN settings at start-time."""
-        super(VlanSwitch, self).start(controllers)
-        # Add VLAN trunks to OVSSwitch ports
-        [trunk_intf(intf, trunks) for intf, trunks in self.trunks.items()]
-        # Add VLAN tag to OVSSwitch ports
-        [tag_intf(intf, tag) for intf, tag in self.tags.items()]
-        # Sets the VLAN mode for OVSSwitch ports
-        [vlan_mode_intf(intf, mode) for intf, mode in self.modes.items()]
+    def intfOpts(self, intf):
+        """
+        Extends OVSSwitch function. Sets the VLAN settings of a port in the same 'ovs-vsctl' command that adds it.
+        The switch is created with all of its ports configured in one transaction,
+        and when Mininet starts switches in a batch every switch in the network shares that one transaction.
+        """
+        opts = super(VlanSwitch, self).intfOpts(intf)
+        settings = port_settings(self.tags.get(intf), self.trunks.get(intf), self.modes.get(intf))
+        if settings:
+            opts += ' -- set port %s %s' % (intf, settings)
+        return opts
+
+
+def benchmark(ports=30, bridge='dvni-bench'):
+    # type: (int, str) -> Dict[str, float]
+    """
+    Times configuring the VLANs of a switch's ports with an 'ovs-vsctl' call per setting, as `VlanSwitch` used to,
+    against a single transaction. Requires root and Open vSwitch.
+
+    Example:
+        >>> benchmark(30)
+        *** 90 ovs-vsctl calls: 1.482s
+        *** 1 ovs-vsctl call: 0.031s (47.8x faster)
+
+    :param ports: Number of ports on the test bridge.
+    :param bridge: Name of the test bridge, it's deleted afterwards.
+    :return: Seconds taken by each approach.
+    """
+    names = ['%s-p%d' % (bridge, i) for i in range(ports)]
+    quietRun('ovs-vsctl --if-exists del-br %s -- add-br %s' % (bridge, bridge) +
+             ''.join(' -- add-port %s %s -- set interface %s type=internal' % (bridge, n, n) for n in names))
+    try:
+        started = time.time()
+        for name in names:
+            quietRun('ovs-vsctl set port %s trunks=1,2,3' % name)
+            quietRun('ovs-vsctl set port %s tag=1' % name)
+            quietRun('ovs-vsctl set port %s vlan_mode=%s' % (name, VlanMode.UNTAGGED.value))
+        separate = time.time() - started
+
+        started = time.time()
+        quietRun('ovs-vsctl' + ''.join(' -- set port %s %s' % (name, port_settings(2, [1, 2, 3], VlanMode.TAGGED))
+                                       for name in names))
+        single = time.time() - started
+    finally:
+        quietRun('ovs-vsctl --if-exists del-br %s' % bridge)
+
+    print('*** %d ovs-vsctl calls: %.3fs' % (ports * 3, separate))
+    print('*** 1 ovs-vsctl call: %.3fs (%.1fx faster)' % (single, separate / max(single, 0.001)))
+    return {'separate': separate, 'single': single}
+
+
+if __name__ == "__main__":
+    benchmark()